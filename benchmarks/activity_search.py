@@ -0,0 +1,96 @@
+"""Recherche d'activités : $regex (ancien mode) contre index texte français.
+
+Construit un corpus synthétique dans une base dédiée puis chronomètre les
+deux requêtes. Usage :
+    BENCH_MONGO_URL=mongodb://localhost:27017 python benchmarks/activity_search.py --size 100000
+"""
+import argparse
+import os
+import random
+import statistics
+import time
+import uuid
+
+from pymongo import MongoClient, IndexModel, TEXT
+
+CATEGORIES = ["Cognitive", "Physique", "Sensorielle", "Créative", "Sociale", "Musicale"]
+DIFFICULTIES = ["Facile", "Moyenne", "Difficile"]
+WORDS = (
+    "atelier cuisine jardinage mémoire musique chant danse peinture lecture conte réminiscence "
+    "gymnastique douce équilibre promenade jeux cartes loto quiz photos souvenirs toucher odeurs "
+    "goût saisons fêtes anniversaire marché tricot couture poterie dessin aquarelle théâtre "
+    "relaxation massage respiration yoga chorale radio journal actualités débat intergénérationnel"
+).split()
+QUERIES = ["cuisine", "jardinage mémoire", "musique", "réminiscence", "peintures", "theatre"]
+
+
+def make_activity(rng):
+    title = " ".join(rng.choice(WORDS) for _ in range(3)).capitalize()
+    return {
+        "id": str(uuid.uuid4()),
+        "title": title,
+        "category": rng.choice(CATEGORIES),
+        "duration": f"{rng.choice([30, 45, 60, 90])} min",
+        "participants": "6-8 personnes",
+        "material": [],
+        "objectives": [],
+        "description": " ".join(rng.choice(WORDS) for _ in range(40)),
+        "difficulty": rng.choice(DIFFICULTIES),
+        "author": "Benchmark",
+        "author_id": None,
+        "is_public": rng.random() < 0.9,
+    }
+
+
+def timed(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), result
+
+
+def main(size, repeat, keep):
+    client = MongoClient(os.getenv("BENCH_MONGO_URL", "mongodb://localhost:27017"))
+    collection = client["bench_activity_search"].activities
+    if collection.estimated_document_count() != size:
+        collection.drop()
+        rng = random.Random(42)
+        for start in range(0, size, 10_000):
+            collection.insert_many([make_activity(rng) for _ in range(min(10_000, size - start))])
+        collection.create_indexes([
+            IndexModel(
+                [("title", TEXT), ("category", TEXT), ("description", TEXT)],
+                weights={"title": 10, "category": 5, "description": 1},
+                default_language="french",
+                language_override="text_language",
+                name="activities_text",
+            )
+        ])
+
+    print(f"corpus: {size} activités, médiane sur {repeat} essais")
+    print(f"{'requête':<20}{'$regex (ms)':>14}{'$text (ms)':>14}{'hits regex':>12}{'hits text':>12}")
+    for query in QUERIES:
+        regex_filter = {"is_public": True, "$or": [
+            {field: {"$regex": query, "$options": "i"}} for field in ("title", "description", "category")
+        ]}
+        text_filter = {"is_public": True, "$text": {"$search": query}}
+        score = {"$meta": "textScore"}
+        regex_ms, regex_hits = timed(lambda: list(collection.find(regex_filter).limit(20)), repeat)
+        text_ms, text_hits = timed(
+            lambda: list(collection.find(text_filter, {"score": score}).sort([("score", score)]).limit(20)), repeat
+        )
+        print(f"{query:<20}{regex_ms:>14.1f}{text_ms:>14.1f}{len(regex_hits):>12}{len(text_hits):>12}")
+
+    if not keep:
+        client.drop_database("bench_activity_search")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--size", type=int, default=100_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--keep", action="store_true", help="garder le corpus pour les prochains runs")
+    args = parser.parse_args()
+    main(args.size, args.repeat, args.keep)
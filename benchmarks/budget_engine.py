@@ -0,0 +1,65 @@
+"""Calcul budgétaire : moteur NumPy vectorisé contre boucle Python par variante.
+
+Usage : python benchmarks/budget_engine.py --variants 5000 --categories 8
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.budget_engine import expense_matrix, evaluate_variants
+
+
+def python_loop(budget, variants, residents):
+    results = []
+    for amounts in variants:
+        total = sum(amounts)
+        results.append({
+            "total_spent": total,
+            "remaining": budget - total,
+            "is_over_budget": total > budget,
+            "shares": [amount / total if total > 0 else 0.0 for amount in amounts],
+            "per_resident": total / residents,
+        })
+    return results
+
+
+def best_of(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - started)
+    return best * 1000
+
+
+def main(variant_count, category_count, repeat):
+    rng = np.random.default_rng(7)
+    variants = rng.uniform(0, 2000, size=(variant_count, category_count)).round(2).tolist()
+    budget, residents = 5000.0, 50
+
+    loop_ms = best_of(lambda: python_loop(budget, variants, residents), repeat)
+    numpy_ms = best_of(lambda: evaluate_variants(budget, expense_matrix(variants, category_count), residents), repeat)
+    # Avec la conversion vers des listes JSON, comme dans la route
+    numpy_json_ms = best_of(
+        lambda: {k: v.tolist() for k, v in evaluate_variants(budget, expense_matrix(variants, category_count), residents).items()},
+        repeat,
+    )
+
+    print(f"{variant_count} variantes x {category_count} catégories (meilleur de {repeat})")
+    print(f"  boucle Python     {loop_ms:8.2f} ms")
+    print(f"  NumPy             {numpy_ms:8.2f} ms  (x{loop_ms / numpy_ms:.1f})")
+    print(f"  NumPy + tolist()  {numpy_json_ms:8.2f} ms  (x{loop_ms / numpy_json_ms:.1f})")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--variants", type=int, default=5000)
+    parser.add_argument("--categories", type=int, default=8)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    main(args.variants, args.categories, args.repeat)
@@ -0,0 +1,85 @@
+"""Compromis CPU / octets de la chaîne de réponse sur des pages réelles :
+encodage JSON (stdlib contre orjson) puis compression gzip / brotli.
+
+Le temps de transfert estimé suppose un lien --mbps (Vercel -> API).
+
+Usage : python benchmarks/compression.py --sizes 20,100,500 --mbps 20
+"""
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+
+import orjson
+from fastapi.encoders import jsonable_encoder
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.list_serialization import activity_document, question_document
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def user_document(index):
+    return {
+        "id": f"user-{index}",
+        "name": f"Soignant {index}",
+        "email": f"soignant{index}@ehpad.fr",
+        "avatar": "nurse",
+        "xp": index * 40,
+        "level": 1 + index // 10,
+        "badges": ["first_quiz", "activity_creator"],
+        "completed_themes": ["legislation", "hygiene"],
+        "created_activities": [],
+        "created_at": "2024-05-01T08:00:00",
+    }
+
+
+def timed(fn, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return result, (time.perf_counter() - started) / repeat * 1000
+
+
+def run(args):
+    pages = {
+        "activities": activity_document,
+        "questions": question_document,
+        "users": user_document,
+    }
+    print(f"{'page':<18} {'encodage':<24} {'octets':>9} {'cpu ms':>8} {'transfert ms':>13}")
+    for name, factory in pages.items():
+        for size in args.sizes:
+            documents = [{k: v for k, v in factory(index).items() if k != "_id"} for index in range(size)]
+            encodable = jsonable_encoder(documents)
+
+            stdlib_body, stdlib_ms = timed(lambda: json.dumps(encodable, ensure_ascii=False, separators=(",", ":")).encode(), args.repeat)
+            body, orjson_ms = timed(lambda: orjson.dumps(documents), args.repeat)
+
+            variants = [("json stdlib", stdlib_body, stdlib_ms), ("orjson", body, orjson_ms)]
+            for level in (1, 6, 9):
+                compressed, ms = timed(lambda: gzip.compress(body, level), args.repeat)
+                variants.append((f"orjson + gzip -{level}", compressed, orjson_ms + ms))
+            if brotli is not None:
+                for quality in (4, 5, 11):
+                    compressed, ms = timed(lambda: brotli.compress(body, quality=quality), max(1, args.repeat // (10 if quality == 11 else 1)))
+                    variants.append((f"orjson + br q{quality}", compressed, orjson_ms + ms))
+
+            for label, payload, cpu_ms in variants:
+                transfer_ms = len(payload) * 8 / (args.mbps * 1e6) * 1000
+                print(f"{name + ' x' + str(size):<18} {label:<24} {len(payload):>9} {cpu_ms:>8.2f} {transfer_ms:>13.1f}")
+            print()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=lambda text: [int(value) for value in text.split(",")], default=[20, 100, 500])
+    parser.add_argument("--mbps", type=float, default=20)
+    parser.add_argument("--repeat", type=int, default=50)
+    run(parser.parse_args())
@@ -0,0 +1,323 @@
+"""Banc de charge reproductible : l'app FastAPI de server.py est pilotée en
+mémoire (ASGI, sans réseau) contre un mongod local, dans une base dédiée
+recréée et seedée par init_database à chaque exécution.
+
+Mélanges de scénarios : connexions, parties de quiz, navigation et
+recherche d'activités, sessions budget. Rapport : débit, p50/p95/p99 par
+étape, appels Mongo par requête. Le résultat peut être enregistré en JSON
+et comparé à une référence (code de sortie 1 en cas de régression).
+Avec --audit, chaque forme de requête émise est passée à explain() et tout
+COLLSCAN fait échouer l'exécution (voir utils/query_audit.py).
+
+Usage :
+    docker run -d -p 27017:27017 mongo:7
+    python benchmarks/harness.py --mix login=1,quiz=4,activities=4,budget=1 \\
+        --users 32 --duration 30 --output benchmarks/results.json
+    python benchmarks/harness.py --baseline benchmarks/results.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from contextlib import asynccontextmanager
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import httpx
+
+SEARCH_TERMS = ["mémoire", "musique", "jardin", "gym douce", "atelier", "chant", "lecture"]
+LOGIN_USERS = 20
+LOGIN_PASSWORD = "bench-password"
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def parse_mix(text):
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in SCENARIOS:
+            raise SystemExit(f"scénario inconnu : {name} (disponibles : {', '.join(SCENARIOS)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+class Recorder:
+    def __init__(self):
+        self.recording = False
+        self.latencies = {}
+        self.errors = {}
+
+    async def call(self, client, label, method, url, **kwargs):
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        elapsed = time.perf_counter() - started
+        if self.recording:
+            self.latencies.setdefault(label, []).append(elapsed)
+            if response.status_code >= 400:
+                self.errors[label] = self.errors.get(label, 0) + 1
+        return response
+
+
+# ---------- Scénarios ----------
+
+async def login_storm(client, rec, rng, ctx):
+    email = f"bench{rng.randrange(LOGIN_USERS)}@ehpad.test"
+    await rec.call(client, "POST /auth/login", "POST", "/api/auth/login", json={"email": email, "password": LOGIN_PASSWORD})
+
+
+async def quiz_play(client, rec, rng, ctx):
+    theme = rng.choice(ctx["themes"])
+    response = await rec.call(
+        client, "POST /quiz/sessions", "POST", "/api/quiz/sessions",
+        params={"user_id": f"user-{rng.randrange(1000)}", "theme": theme, "count": 5}
+    )
+    if response.status_code != 200:
+        return
+    session = response.json()
+    for question_id in session["questions"]:
+        await rec.call(
+            client, "POST /quiz/sessions/{id}/answer", "POST", f"/api/quiz/sessions/{session['id']}/answer",
+            params={"question_id": question_id, "user_answer": rng.randrange(4)}
+        )
+    await rec.call(client, "GET /quiz/sessions/{id}/results", "GET", f"/api/quiz/sessions/{session['id']}/results")
+
+
+async def activity_browse(client, rec, rng, ctx):
+    response = await rec.call(client, "GET /activities", "GET", "/api/activities/", params={"limit": 20})
+    cursor = response.headers.get("X-Next-Cursor")
+    if cursor:
+        await rec.call(client, "GET /activities (page 2)", "GET", "/api/activities/", params={"limit": 20, "cursor": cursor})
+    await rec.call(client, "GET /activities/search", "GET", "/api/activities/search", params={"q": rng.choice(SEARCH_TERMS)})
+    activities = response.json() if response.status_code == 200 else []
+    if activities:
+        activity = rng.choice(activities)
+        await rec.call(client, "GET /activities/{id}", "GET", f"/api/activities/{activity['id']}")
+
+
+async def budget_session(client, rec, rng, ctx):
+    response = await rec.call(client, "GET /budget/scenarios", "GET", "/api/budget/scenarios")
+    scenarios = response.json() if response.status_code == 200 else []
+    if not scenarios:
+        return
+    scenario = rng.choice(scenarios)
+    response = await rec.call(
+        client, "POST /budget/sessions", "POST", "/api/budget/sessions",
+        params={"user_id": f"user-{rng.randrange(1000)}", "scenario_id": scenario["id"]}
+    )
+    if response.status_code != 200:
+        return
+    session = response.json()
+    for index, question in enumerate(scenario["questions"]):
+        await rec.call(
+            client, "POST /budget/sessions/{id}/answer", "POST", f"/api/budget/sessions/{session['id']}/answer",
+            params={"question_index": index, "user_answer": rng.randrange(len(question["options"]))}
+        )
+    await rec.call(client, "GET /budget/sessions/{id}/results", "GET", f"/api/budget/sessions/{session['id']}/results")
+
+
+SCENARIOS = {
+    "login": login_storm,
+    "quiz": quiz_play,
+    "activities": activity_browse,
+    "budget": budget_session,
+}
+
+
+# ---------- Exécution ----------
+
+@asynccontextmanager
+async def running_app(args):
+    os.environ["MONGO_URL"] = args.mongo_url
+    os.environ["DB_NAME"] = args.db_name
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    if args.audit:
+        os.environ["QUERY_AUDIT"] = "1"
+
+    from motor.motor_asyncio import AsyncIOMotorClient
+    if not args.keep_db:
+        # Base repartie de zéro : mêmes données que init_database à chaque fois
+        admin = AsyncIOMotorClient(args.mongo_url)
+        await admin.drop_database(args.db_name)
+        admin.close()
+
+    from server import app
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            yield client
+
+
+async def prepare(client):
+    from database import get_database
+    from models.user import User
+    from utils.auth import get_password_hash
+
+    db = await get_database()
+    hashed = get_password_hash(LOGIN_PASSWORD)
+    for index in range(LOGIN_USERS):
+        user = User(name=f"Bench {index}", email=f"bench{index}@ehpad.test", hashed_password=hashed)
+        await db.users.update_one({"email": user.email}, {"$setOnInsert": user.dict()}, upsert=True)
+    themes = (await client.get("/api/quiz/themes")).json()
+    return {"themes": [theme["id"] for theme in themes if theme.get("questions_count", 1)]}
+
+
+def mongo_snapshot():
+    from utils.metrics import metrics
+    return metrics.request_mongo_calls.totals()
+
+
+def mongo_delta(before, after):
+    routes = {}
+    requests = calls = 0
+    for labels, (count, total) in after.items():
+        previous_count, previous_total = before.get(labels, (0, 0))
+        count, total = count - previous_count, total - previous_total
+        if count:
+            routes[" ".join(labels)] = total / count
+            requests += count
+            calls += total
+    return calls / requests if requests else 0.0, routes
+
+
+async def virtual_user(index, client, rec, args, ctx, mix, stop):
+    rng = random.Random(args.seed * 1000 + index)
+    names, weights = list(mix), list(mix.values())
+    while not stop.is_set():
+        scenario = rng.choices(names, weights)[0]
+        await SCENARIOS[scenario](client, rec, rng, ctx)
+
+
+async def run(args):
+    mix = parse_mix(args.mix)
+    rec = Recorder()
+    async with running_app(args) as client:
+        ctx = await prepare(client)
+        stop = asyncio.Event()
+        users = [asyncio.create_task(virtual_user(index, client, rec, args, ctx, mix, stop)) for index in range(args.users)]
+
+        await asyncio.sleep(args.warmup)
+        before = mongo_snapshot()
+        rec.recording = True
+        started = time.perf_counter()
+        await asyncio.sleep(args.duration)
+        rec.recording = False
+        elapsed = time.perf_counter() - started
+        after = mongo_snapshot()
+
+        stop.set()
+        for outcome in await asyncio.gather(*users, return_exceptions=True):
+            if isinstance(outcome, Exception):
+                raise outcome
+
+        violations = await audit_queries() if args.audit else None
+
+    mongo_per_request, mongo_routes = mongo_delta(before, after)
+    total = sum(len(values) for values in rec.latencies.values())
+    return {
+        "config": {
+            "mix": mix,
+            "users": args.users,
+            "duration": args.duration,
+            "seed": args.seed,
+        },
+        "requests": total,
+        "throughput_rps": total / elapsed,
+        "mongo_calls_per_request": mongo_per_request,
+        "mongo_calls_by_route": mongo_routes,
+        "steps": {
+            label: {
+                "count": len(values),
+                "errors": rec.errors.get(label, 0),
+                "p50_ms": percentile(values, 50) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "p99_ms": percentile(values, 99) * 1000,
+            }
+            for label, values in sorted(rec.latencies.items())
+        },
+        "collscans": violations,
+    }
+
+
+async def audit_queries():
+    from database import get_database
+    from utils.query_audit import query_auditor
+    return await query_auditor.check(await get_database())
+
+
+def print_report(result):
+    print(f"{result['requests']} requêtes, {result['throughput_rps']:.1f} req/s, "
+          f"{result['mongo_calls_per_request']:.2f} appels Mongo / requête")
+    print(f"  {'étape':<40} {'n':>7} {'err':>5} {'p50':>8} {'p95':>8} {'p99':>8}")
+    for label, step in result["steps"].items():
+        print(f"  {label:<40} {step['count']:>7} {step['errors']:>5} "
+              f"{step['p50_ms']:>8.1f} {step['p95_ms']:>8.1f} {step['p99_ms']:>8.1f}")
+    for violation in result["collscans"] or []:
+        print(f"  COLLSCAN {violation['route']} -> {violation['collection']}.{violation['command']} "
+              f"{violation['filter']} {violation.get('error', '')}")
+
+
+def compare(result, baseline, tolerance):
+    """Affiche les écarts avec la référence ; renvoie les régressions."""
+    regressions = []
+    ratio = result["throughput_rps"] / baseline["throughput_rps"] if baseline["throughput_rps"] else 1
+    print(f"débit : {baseline['throughput_rps']:.1f} -> {result['throughput_rps']:.1f} req/s ({(ratio - 1) * 100:+.1f} %)")
+    if ratio < 1 - tolerance:
+        regressions.append("throughput")
+    if result["mongo_calls_per_request"] > baseline["mongo_calls_per_request"] * (1 + tolerance) + 0.01:
+        regressions.append("mongo_calls_per_request")
+    for label, step in result["steps"].items():
+        reference = baseline["steps"].get(label)
+        if reference is None:
+            continue
+        change = step["p95_ms"] / reference["p95_ms"] - 1 if reference["p95_ms"] else 0
+        flag = "  <-- régression" if change > tolerance else ""
+        print(f"  {label:<40} p95 {reference['p95_ms']:>8.1f} -> {step['p95_ms']:>8.1f} ms ({change * 100:+.1f} %){flag}")
+        if flag:
+            regressions.append(label)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mongo-url", default=os.getenv("BENCH_MONGO_URL", "mongodb://localhost:27017"))
+    parser.add_argument("--db-name", default="ehpad_bench")
+    parser.add_argument("--keep-db", action="store_true", help="ne pas recréer la base")
+    parser.add_argument("--mix", default="login=1,quiz=4,activities=4,budget=1")
+    parser.add_argument("--users", type=int, default=32, help="utilisateurs virtuels concurrents")
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--warmup", type=float, default=3)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="fichier JSON de résultats")
+    parser.add_argument("--baseline", help="fichier JSON de référence à comparer")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="écart toléré (0.10 = 10 %%)")
+    parser.add_argument("--audit", action="store_true", help="échoue si une requête fait un COLLSCAN")
+    args = parser.parse_args()
+
+    result = asyncio.run(run(args))
+    print_report(result)
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(result, output, indent=2, ensure_ascii=False)
+    failed = bool(result["collscans"])
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(result, json.load(baseline_file), args.tolerance)
+        if regressions:
+            print(f"régressions : {', '.join(regressions)}")
+            failed = True
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Coût CPU d'une page de liste : ancien chemin (Model(**doc) puis
+response_model FastAPI) contre validation unique + dump_json.
+
+Usage : python benchmarks/list_serialization.py --items 100 --seconds 2
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import uuid
+from datetime import datetime
+from typing import List
+
+from bson import ObjectId
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from pydantic import TypeAdapter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.activity import ActivitySheet
+from models.quiz import QuizQuestion
+
+
+def activity_document(index):
+    return {
+        "_id": ObjectId(),
+        "id": str(uuid.uuid4()),
+        "title": f"Atelier {index}",
+        "category": "Cognitive",
+        "duration": "60 min",
+        "participants": "6-8 personnes",
+        "material": ["Ingrédients simples", "Ustensiles adaptés", "Tabliers"],
+        "objectives": ["Stimuler la mémoire", "Favoriser la socialisation"],
+        "description": "Atelier de préparation de recettes simples favorisant les échanges. " * 4,
+        "difficulty": "Facile",
+        "author": "Équipe pédagogique",
+        "author_id": None,
+        "is_public": True,
+        "created_at": datetime.utcnow(),
+        "updated_at": datetime.utcnow(),
+    }
+
+
+def question_document(index):
+    return {
+        "_id": ObjectId(),
+        "id": f"q_{index}",
+        "question": "Quel est le ratio minimum d'encadrement en EHPAD ?",
+        "options": ["1 pour 10", "1 pour 8", "1 pour 6", "1 pour 12"],
+        "correct_answer": 1,
+        "explanation": "Le ratio minimum est de 1 soignant pour 8 résidents.",
+        "theme": "legislation",
+        "difficulty": "medium",
+        "created_at": datetime.utcnow(),
+    }
+
+
+def old_path(model, field):
+    async def render(documents):
+        content = [model(**document) for document in documents]
+        serialized = await serialize_response(field=field, response_content=content, is_coroutine=True)
+        return json.dumps(serialized, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+    return render
+
+
+def new_path(adapter):
+    async def render(documents):
+        return adapter.dump_json(adapter.validate_python(documents))
+    return render
+
+
+def throughput(render, documents, seconds):
+    loop = asyncio.new_event_loop()
+    count, started = 0, time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        loop.run_until_complete(render(documents))
+        count += 1
+    loop.close()
+    return count / (time.perf_counter() - started)
+
+
+def main(items, seconds):
+    for name, model, factory in (("activities", ActivitySheet, activity_document), ("questions", QuizQuestion, question_document)):
+        documents = [factory(index) for index in range(items)]
+        field = create_response_field(name="response", type_=List[model])
+        before = throughput(old_path(model, field), documents, seconds)
+        after = throughput(new_path(TypeAdapter(List[model])), documents, seconds)
+        print(f"{name:<11} {items} items/page : avant {before:8.0f} pages/s, après {after:8.0f} pages/s (x{after / before:.1f}) sur un cœur")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--items", type=int, default=100)
+    parser.add_argument("--seconds", type=float, default=2)
+    args = parser.parse_args()
+    main(args.items, args.seconds)
@@ -0,0 +1,66 @@
+"""Latence de /api/quiz/themes pendant une rafale de connexions.
+
+Usage : python benchmarks/login_burst.py --base-url http://127.0.0.1:8000 \
+            --email demo@ehpad.fr --password secret --logins 16 --duration 20
+"""
+import argparse
+import os
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def hammer_login(base_url, email, password, stop, counters):
+    session = requests.Session()
+    while not stop.is_set():
+        response = session.post(f"{base_url}/api/auth/login", json={"email": email, "password": password})
+        counters[response.status_code] = counters.get(response.status_code, 0) + 1
+
+
+def sample_themes(base_url, stop, latencies):
+    session = requests.Session()
+    while not stop.is_set():
+        started = time.perf_counter()
+        session.get(f"{base_url}/api/quiz/themes")
+        latencies.append((time.perf_counter() - started) * 1000)
+        time.sleep(0.01)
+
+
+def run(base_url, email, password, logins, duration, internal_token=None):
+    stop = threading.Event()
+    latencies, counters = [], {}
+    with ThreadPoolExecutor(max_workers=logins + 1) as pool:
+        pool.submit(sample_themes, base_url, stop, latencies)
+        for _ in range(logins):
+            pool.submit(hammer_login, base_url, email, password, stop, counters)
+        time.sleep(duration)
+        stop.set()
+
+    print(f"login responses: {counters}")
+    print(f"/api/quiz/themes samples: {len(latencies)}")
+    print(f"  mean {statistics.mean(latencies):8.1f} ms")
+    for pct in (50, 95, 99):
+        print(f"  p{pct:<3} {percentile(latencies, pct):8.1f} ms")
+    stats = requests.get(f"{base_url}/api/internal/password-hasher", headers={"X-Internal-Token": internal_token or ""}).json()
+    print(f"password hasher: {stats}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--logins", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--internal-token", default=os.getenv("INTERNAL_API_TOKEN"))
+    args = parser.parse_args()
+    run(args.base_url, args.email, args.password, args.logins, args.duration, args.internal_token)
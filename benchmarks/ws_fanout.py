@@ -0,0 +1,93 @@
+"""Latence de diffusion du hub WebSocket avec des clients en mémoire.
+
+Chaque faux client horodate la réception ; on mesure le délai entre
+l'appel à broadcast() et la livraison sur chaque socket.
+
+Usage : python benchmarks/ws_fanout.py --connections 5000 --messages 50
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.ws_hub import ConnectionHub
+
+
+class FakeWebSocket:
+    def __init__(self, latencies, delay=0.0):
+        self.latencies = latencies
+        self.delay = delay
+        self.received = 0
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        message = json.loads(text)
+        sent_at = message.get("data", {}).get("sent_at")
+        if sent_at is not None:
+            self.latencies.append(time.perf_counter() - sent_at)
+        self.received += 1
+
+    async def close(self, code=1000):
+        pass
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+async def run(args):
+    hub = ConnectionHub(args.queue_size, args.policy, heartbeat_interval=3600, idle_timeout=3600)
+    latencies = []
+    sockets = []
+    for index in range(args.connections):
+        slow = index < args.connections * args.slow_ratio
+        socket = FakeWebSocket(latencies, delay=0.05 if slow else 0.0)
+        connection = await hub.connect(socket)
+        hub.join(connection, "quiz:classroom")
+        sockets.append(socket)
+
+    broadcast_times = []
+    started = time.perf_counter()
+    for _ in range(args.messages):
+        t0 = time.perf_counter()
+        hub.broadcast("quiz:classroom", {"type": "message", "data": {"sent_at": time.perf_counter()}})
+        broadcast_times.append(time.perf_counter() - t0)
+        await asyncio.sleep(args.interval)
+
+    # Laisse les files se vider
+    while any(connection.queue.qsize() for connection in hub.connections):
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+
+    print(f"{args.connections} connexions, {args.messages} messages, politique={args.policy}")
+    print(f"  broadcast() : moy {statistics.mean(broadcast_times) * 1000:.2f} ms, max {max(broadcast_times) * 1000:.2f} ms")
+    print(f"  livraison   : p50 {percentile(latencies, 50) * 1000:.2f} ms, "
+          f"p95 {percentile(latencies, 95) * 1000:.2f} ms, p99 {percentile(latencies, 99) * 1000:.2f} ms")
+    print(f"  {len(latencies)} messages livrés en {elapsed:.2f} s")
+    print(f"  {json.dumps(hub.stats())}")
+    await hub.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--connections", type=int, default=5000)
+    parser.add_argument("--messages", type=int, default=50)
+    parser.add_argument("--interval", type=float, default=0.02)
+    parser.add_argument("--queue-size", type=int, default=256)
+    parser.add_argument("--policy", choices=["drop", "disconnect"], default="disconnect")
+    parser.add_argument("--slow-ratio", type=float, default=0.0, help="part de clients lents (50 ms par envoi)")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+"""Vérifie que des appels /xp concurrents ne perdent aucune mise à jour.
+
+Usage : python benchmarks/xp_concurrency.py --base-url http://127.0.0.1:8000 --user-id <id> --calls 1000
+"""
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def main(base_url, user_id, calls, concurrency, xp_points):
+    before = requests.get(f"{base_url}/api/users/{user_id}").json()
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    def award(_):
+        return session.post(f"{base_url}/api/users/{user_id}/xp", params={"xp_points": xp_points}).status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        statuses = list(pool.map(award, range(calls)))
+    elapsed = time.perf_counter() - started
+
+    after = requests.get(f"{base_url}/api/users/{user_id}").json()
+    expected_xp = before["xp"] + calls * xp_points
+    expected_level = expected_xp // 100 + 1
+    print(f"{calls} appels en {elapsed:.2f}s ({calls / elapsed:.0f} req/s), statuts: {set(statuses)}")
+    print(f"xp {before['xp']} -> {after['xp']} (attendu {expected_xp}), niveau {after['level']} (attendu {expected_level})")
+    if after["xp"] != expected_xp or after["level"] != expected_level:
+        raise SystemExit("mise à jour perdue")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--user-id", required=True)
+    parser.add_argument("--calls", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--xp-points", type=int, default=7)
+    args = parser.parse_args()
+    main(args.base_url, args.user_id, args.calls, args.concurrency, args.xp_points)
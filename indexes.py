@@ -0,0 +1,115 @@
+from pymongo import IndexModel, TEXT, ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Registre déclaratif des index, collection par collection. Toute requête
+# filtrée d'une route doit être couverte (voir utils/query_audit.py).
+# Après modification, ajouter une migration qui appelle sync_indexes.
+INDEXES = {
+    "users": [
+        IndexModel("email", unique=True),
+        IndexModel("id", unique=True),
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ],
+    "user_progress": [
+        IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)]),
+    ],
+    "quiz_themes": [
+        IndexModel("id", unique=True),
+        IndexModel("order"),
+    ],
+    "quiz_questions": [
+        IndexModel("id", unique=True),
+        IndexModel("theme"),
+    ],
+    "quiz_sessions": [
+        IndexModel("id", unique=True),
+        IndexModel("user_id"),
+        # Claims live expirés, nettoyés au démarrage (utils/live_quiz.py)
+        IndexModel("live", sparse=True),
+    ],
+    "quiz_answers": [
+        IndexModel("session_id"),
+    ],
+    "activities": [
+        IndexModel("id", unique=True),
+        IndexModel(
+            [("title", TEXT), ("category", TEXT), ("description", TEXT)],
+            weights={"title": 10, "category": 5, "description": 1},
+            default_language="french",
+            language_override="text_language",
+            name="activities_text",
+        ),
+        # Pagination par curseur (created_at, _id) ; couvrent aussi les
+        # filtres simples sur author_id et category
+        IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("is_public", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("author_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        IndexModel([("category", ASCENDING), ("is_public", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ],
+    "budget_scenarios": [
+        IndexModel("id", unique=True),
+    ],
+    "budget_sessions": [
+        IndexModel("id", unique=True),
+        IndexModel("user_id"),
+    ],
+    "budget_calculations": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+    ],
+    "game_config": [
+        IndexModel("type", unique=True),
+    ],
+    "status_checks": [
+        IndexModel([("timestamp", DESCENDING)]),
+    ],
+    # Cache de réponses partagé : purgé par Mongo à expiration
+    "response_cache": [
+        IndexModel("expires_at", expireAfterSeconds=0),
+    ],
+    # Accès par _id uniquement
+    "cache_versions": [],
+    "schema_meta": [],
+}
+
+
+async def sync_collection(db, name: str, models, drop_undeclared: bool):
+    if models:
+        await db[name].create_indexes(models)
+    declared = {model.document["name"] for model in models} | {"_id_"}
+    undeclared = [index["name"] async for index in db[name].list_indexes() if index["name"] not in declared]
+    if drop_undeclared:
+        for index_name in undeclared:
+            await db[name].drop_index(index_name)
+    return undeclared
+
+
+async def drop_indexes(db, name: str, index_names):
+    """Supprime des index précis ; ceux déjà absents sont ignorés."""
+    existing = {index["name"] async for index in db[name].list_indexes()}
+    for index_name in index_names:
+        if index_name in existing:
+            await db[name].drop_index(index_name)
+            logger.info("Dropped index %s on %s", index_name, name)
+
+
+async def sync_indexes(db, drop_undeclared: bool = False):
+    """Crée les index déclarés. Les index non déclarés (ajoutés par l'exploitation,
+    suggestions Atlas, hotfix...) sont seulement signalés, sauf drop_undeclared=True."""
+    results = await asyncio.gather(
+        *(sync_collection(db, name, models, drop_undeclared) for name, models in INDEXES.items()),
+        return_exceptions=True
+    )
+    for name, result in zip(INDEXES, results):
+        if isinstance(result, OperationFailure):
+            logger.error("Index sync failed on %s: %s", name, result)
+            raise result
+        if isinstance(result, Exception):
+            raise result
+        if result and drop_undeclared:
+            logger.info("Dropped undeclared indexes on %s: %s", name, ", ".join(result))
+        elif result:
+            logger.warning("Undeclared indexes on %s (kept): %s", name, ", ".join(result))
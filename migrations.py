@@ -0,0 +1,319 @@
+from pymongo import IndexModel, TEXT, ASCENDING, DESCENDING
+from pymongo.errors import DuplicateKeyError
+from datetime import datetime, timedelta
+import asyncio
+import logging
+import os
+import socket
+import time
+import uuid
+
+from indexes import sync_indexes, drop_indexes
+from utils.query_audit import audited_as
+
+logger = logging.getLogger(__name__)
+
+# Version du schéma stockée dans db.schema_meta ; chaque migration n'est
+# jouée qu'une fois, par un seul worker à la fois.
+SCHEMA_DOC_ID = "schema"
+LOCK_DOC_ID = "migration_lock"
+LOCK_TTL = timedelta(minutes=2)
+LOCK_POLL_INTERVAL = 0.5
+# Le verrou est prolongé pendant les étapes longues (index sur de grosses collections)
+LOCK_RENEW_INTERVAL = LOCK_TTL.total_seconds() / 4
+
+MIGRATIONS = []
+
+def migration(version: int):
+    def register(fn):
+        MIGRATIONS.append((version, fn))
+        MIGRATIONS.sort(key=lambda item: item[0])
+        return fn
+    return register
+
+# ---------- Données initiales ----------
+
+SAMPLE_THEMES = [
+    {"id": "legislation", "name": "Législation", "description": "Règles et lois régissant les EHPAD", "icon": "⚖️", "color": "bg-blue-500", "order": 0, "questions_count": 0},
+    {"id": "animation_types", "name": "Types d'Animation", "description": "Différentes formes d'animation en EHPAD", "icon": "🎭", "color": "bg-green-500", "order": 1, "questions_count": 0},
+    {"id": "project_management", "name": "Gestion de Projet", "description": "Planification et organisation d'activités", "icon": "📋", "color": "bg-purple-500", "order": 2, "questions_count": 0},
+    {"id": "budget_management", "name": "Gestion de Budget", "description": "Maîtrise des aspects financiers", "icon": "💰", "color": "bg-orange-500", "order": 3, "questions_count": 0}
+]
+
+SAMPLE_QUESTIONS = [
+    {
+        "id": "leg_1",
+        "question": "Quel est le ratio minimum d'encadrement en EHPAD ?",
+        "options": ["1 soignant pour 10 résidents", "1 soignant pour 8 résidents", "1 soignant pour 6 résidents", "1 soignant pour 12 résidents"],
+        "correct_answer": 1,
+        "explanation": "Le ratio minimum est de 1 soignant pour 8 résidents selon la réglementation.",
+        "theme": "legislation",
+        "difficulty": "medium"
+    },
+    {
+        "id": "leg_2",
+        "question": "Quelle autorisation est nécessaire pour ouvrir un EHPAD ?",
+        "options": ["Autorisation préfectorale", "Autorisation du conseil départemental", "Autorisation de l'ARS", "Autorisation municipale"],
+        "correct_answer": 2,
+        "explanation": "L'Agence Régionale de Santé (ARS) délivre l'autorisation d'ouverture.",
+        "theme": "legislation",
+        "difficulty": "medium"
+    },
+    {
+        "id": "anim_1",
+        "question": "Quelle activité est recommandée pour stimuler la mémoire ?",
+        "options": ["Jeux de cartes", "Réminiscence", "Gymnastique douce", "Musique"],
+        "correct_answer": 1,
+        "explanation": "Les activités de réminiscence stimulent efficacement la mémoire autobiographique.",
+        "theme": "animation_types",
+        "difficulty": "easy"
+    },
+    {
+        "id": "proj_1",
+        "question": "Première étape d'un projet d'animation ?",
+        "options": ["Définir les objectifs", "Choisir l'activité", "Préparer le matériel", "Évaluer les résidents"],
+        "correct_answer": 3,
+        "explanation": "L'évaluation des résidents est essentielle pour adapter l'activité.",
+        "theme": "project_management",
+        "difficulty": "medium"
+    },
+    {
+        "id": "bud_1",
+        "question": "Quel pourcentage du budget total est généralement alloué aux animations ?",
+        "options": ["2-5%", "8-12%", "15-20%", "25-30%"],
+        "correct_answer": 0,
+        "explanation": "Le budget animation représente généralement 2 à 5% du budget total.",
+        "theme": "budget_management",
+        "difficulty": "hard"
+    }
+]
+
+SAMPLE_ACTIVITIES = [
+    {
+        "id": "act_1",
+        "title": "Atelier Cuisine Thérapeutique",
+        "category": "Cognitive",
+        "duration": "60 min",
+        "participants": "6-8 personnes",
+        "material": ["Ingrédients simples", "Ustensiles adaptés", "Tabliers"],
+        "objectives": ["Stimuler la mémoire", "Favoriser la socialisation", "Maintenir l'autonomie"],
+        "description": "Atelier de préparation de recettes simples favorisant les échanges et la stimulation cognitive.",
+        "difficulty": "Facile",
+        "author": "Équipe pédagogique",
+        "author_id": None,
+        "is_public": True
+    },
+    {
+        "id": "act_2",
+        "title": "Jardinage Adapté",
+        "category": "Physique",
+        "duration": "45 min",
+        "participants": "4-6 personnes",
+        "material": ["Graines", "Petits outils", "Jardinières"],
+        "objectives": ["Stimulation sensorielle", "Activité physique douce", "Contact avec la nature"],
+        "description": "Activité de plantation et d'entretien de plantes adaptée aux capacités des résidents.",
+        "difficulty": "Moyenne",
+        "author": "Équipe pédagogique",
+        "author_id": None,
+        "is_public": True
+    }
+]
+
+SAMPLE_SCENARIO = {
+    "id": "scen_1",
+    "title": "Budget Annuel Animation",
+    "description": "Vous devez gérer un budget annuel de 5000€ pour les animations d'un EHPAD de 50 résidents.",
+    "budget": 5000,
+    "expenses": [
+        {"category": "Matériel artistique", "amount": 1200},
+        {"category": "Intervenants extérieurs", "amount": 2000},
+        {"category": "Sorties", "amount": 800},
+        {"category": "Fêtes et événements", "amount": 1000}
+    ],
+    "questions": [
+        {
+            "question": "Quel est le budget par résident pour l'année ?",
+            "options": ["80€", "100€", "120€", "150€"],
+            "correct_answer": 1,
+            "explanation": "5000€ / 50 résidents = 100€ par résident"
+        }
+    ],
+    "difficulty": "medium"
+}
+
+async def seed_if_empty(collection, documents):
+    if await collection.count_documents({}, limit=1):
+        return
+    await collection.insert_many([dict(document) for document in documents])
+
+@migration(1)
+async def initial_schema(db):
+    await asyncio.gather(
+        db.users.create_indexes([IndexModel("email", unique=True), IndexModel("id", unique=True)]),
+        db.quiz_questions.create_indexes([IndexModel("theme")]),
+        db.quiz_sessions.create_indexes([IndexModel("user_id")]),
+        db.activities.create_indexes([IndexModel("author_id"), IndexModel("category")]),
+        db.budget_sessions.create_indexes([IndexModel("user_id")]),
+        db.budget_calculations.create_indexes([IndexModel("user_id")]),
+    )
+
+    themes = [
+        {**theme, "questions_count": sum(1 for q in SAMPLE_QUESTIONS if q["theme"] == theme["id"])}
+        for theme in SAMPLE_THEMES
+    ]
+    await asyncio.gather(
+        seed_if_empty(db.quiz_themes, themes),
+        seed_if_empty(db.quiz_questions, SAMPLE_QUESTIONS),
+        seed_if_empty(db.activities, SAMPLE_ACTIVITIES),
+        seed_if_empty(db.budget_scenarios, [SAMPLE_SCENARIO]),
+    )
+
+@migration(2)
+async def activities_text_search(db):
+    # Index texte en français : racinisation, casse et accents ignorés
+    await db.activities.create_indexes([
+        IndexModel(
+            [("title", TEXT), ("category", TEXT), ("description", TEXT)],
+            weights={"title": 10, "category": 5, "description": 1},
+            default_language="french",
+            language_override="text_language",
+            name="activities_text",
+        )
+    ])
+
+@migration(3)
+async def keyset_pagination(db):
+    # Les documents seedés n'ont pas de date : on la déduit de l'ObjectId
+    await asyncio.gather(
+        db.activities.update_many({"created_at": {"$exists": False}}, [{"$set": {"created_at": {"$toDate": "$_id"}}}]),
+        db.users.update_many({"created_at": {"$exists": False}}, [{"$set": {"created_at": {"$toDate": "$_id"}}}]),
+        db.user_progress.update_many({"timestamp": {"$exists": False}}, [{"$set": {"timestamp": {"$toDate": "$_id"}}}]),
+        db.budget_calculations.update_many({"created_at": {"$exists": False}}, [{"$set": {"created_at": {"$toDate": "$_id"}}}]),
+    )
+    await asyncio.gather(
+        db.activities.create_indexes([
+            IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)]),
+            IndexModel([("is_public", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+            IndexModel([("author_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+            IndexModel([("category", ASCENDING), ("is_public", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)]),
+        ]),
+        db.users.create_indexes([IndexModel([("created_at", DESCENDING), ("_id", DESCENDING)])]),
+        db.user_progress.create_indexes([IndexModel([("user_id", ASCENDING), ("timestamp", DESCENDING), ("_id", DESCENDING)])]),
+        db.budget_calculations.create_indexes([IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING), ("_id", DESCENDING)])]),
+    )
+
+@migration(4)
+async def unique_game_config(db):
+    # Rend idempotente l'insertion de la configuration par défaut ; les
+    # doublons issus d'insertions concurrentes sont d'abord supprimés
+    configs = await db.game_config.find({"type": "main"}, {"_id": 1}).sort("_id", 1).to_list(None)
+    if len(configs) > 1:
+        await db.game_config.delete_many({"_id": {"$in": [config["_id"] for config in configs[1:]]}})
+    await db.game_config.create_indexes([IndexModel("type", unique=True)])
+
+@migration(5)
+async def index_registry(db):
+    # Index des recherches par id (sessions, activités, questions, scénarios...)
+    # et suppression des index préfixes devenus redondants (créés en v1)
+    await asyncio.gather(
+        drop_indexes(db, "activities", ["author_id_1", "category_1"]),
+        drop_indexes(db, "budget_calculations", ["user_id_1"]),
+    )
+    await sync_indexes(db)
+
+@migration(6)
+async def response_cache_ttl(db):
+    await sync_indexes(db)
+
+@migration(7)
+async def live_claim_index(db):
+    await sync_indexes(db)
+
+@migration(8)
+async def sample_scenario_residents(db):
+    # Nombre de résidents du scénario d'exemple, pour le coût par résident
+    await db.budget_scenarios.update_one(
+        {"id": SAMPLE_SCENARIO["id"], "residents": {"$exists": False}},
+        {"$set": {"residents": 50}}
+    )
+
+@migration(9)
+async def game_config_version(db):
+    # Les configurations insérées avant le cache n'ont pas de version : sans
+    # elle, une modification ne serait jamais rechargée par les workers
+    await db.game_config.update_many({"version": {"$exists": False}}, {"$set": {"version": 1}})
+
+async def get_schema_version(db) -> int:
+    meta = await db.schema_meta.find_one({"_id": SCHEMA_DOC_ID}, {"version": 1})
+    return meta["version"] if meta else 0
+
+async def acquire_lock(db, owner: str) -> bool:
+    now = datetime.utcnow()
+    try:
+        await db.schema_meta.find_one_and_update(
+            {"_id": LOCK_DOC_ID, "$or": [{"expires_at": {"$lt": now}}, {"owner": owner}]},
+            {"$set": {"owner": owner, "expires_at": now + LOCK_TTL}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        # Verrou détenu (et non expiré) par un autre worker
+        return False
+    return True
+
+async def renew_lock(db, owner: str) -> bool:
+    result = await db.schema_meta.update_one(
+        {"_id": LOCK_DOC_ID, "owner": owner},
+        {"$set": {"expires_at": datetime.utcnow() + LOCK_TTL}}
+    )
+    return result.matched_count == 1
+
+async def keep_lock(db, owner: str):
+    while True:
+        await asyncio.sleep(LOCK_RENEW_INTERVAL)
+        if not await renew_lock(db, owner):
+            logger.error("Migration lock lost by %s", owner)
+            return
+
+async def release_lock(db, owner: str):
+    await db.schema_meta.delete_one({"_id": LOCK_DOC_ID, "owner": owner})
+
+async def run_migrations(db):
+    started = time.perf_counter()
+    target = MIGRATIONS[-1][0]
+
+    current = await get_schema_version(db)
+    if current >= target:
+        logger.info("Schema v%s up to date (%.1f ms)", current, (time.perf_counter() - started) * 1000)
+        return
+
+    owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+    while not await acquire_lock(db, owner):
+        await asyncio.sleep(LOCK_POLL_INTERVAL)
+        current = await get_schema_version(db)
+        if current >= target:
+            logger.info("Schema v%s migrated by another worker (%.1f ms)", current, (time.perf_counter() - started) * 1000)
+            return
+
+    heartbeat = asyncio.create_task(keep_lock(db, owner))
+    try:
+        current = await get_schema_version(db)
+        for version, apply in MIGRATIONS:
+            if version <= current:
+                continue
+            step_started = time.perf_counter()
+            with audited_as("migration"):
+                await apply(db)
+            # Verrou expiré et repris par un autre worker : on n'écrit pas la version
+            if not await renew_lock(db, owner):
+                raise RuntimeError(f"Migration lock lost during migration {version} ({apply.__name__})")
+            await db.schema_meta.update_one(
+                {"_id": SCHEMA_DOC_ID},
+                {"$set": {"version": version, "updated_at": datetime.utcnow()}},
+                upsert=True
+            )
+            logger.info("Migration %s (%s) applied in %.1f ms", version, apply.__name__, (time.perf_counter() - step_started) * 1000)
+    finally:
+        heartbeat.cancel()
+        await release_lock(db, owner)
+
+    logger.info("Schema migrated from v%s to v%s in %.1f ms", current, target, (time.perf_counter() - started) * 1000)
@@ -19,6 +19,9 @@ class ActivitySheet(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+class ActivitySearchHit(ActivitySheet):
+    score: float
+
 class ActivitySheetCreate(BaseModel):
     title: str
     category: str
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, Field
-from typing import List, Optional
+from pydantic import BaseModel, Field, confloat
+from typing import Dict, List, Optional
 from datetime import datetime
 import uuid
 
@@ -21,6 +21,7 @@ class BudgetScenario(BaseModel):
     expenses: List[BudgetExpense]
     questions: List[BudgetQuestion]
     difficulty: str = "medium"
+    residents: Optional[int] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
 
 class BudgetScenarioCreate(BaseModel):
@@ -30,6 +31,7 @@ class BudgetScenarioCreate(BaseModel):
     expenses: List[BudgetExpense]
     questions: List[BudgetQuestion]
     difficulty: str = "medium"
+    residents: Optional[int] = None
 
 class BudgetSession(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -48,4 +50,53 @@ class BudgetCalculation(BaseModel):
     total_spent: float
     remaining: float
     is_over_budget: bool
-    created_at: datetime = Field(default_factory=datetime.utcnow)
\ No newline at end of file
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+
+class BudgetCalculationBatch(BaseModel):
+    user_id: str
+    scenario_id: str
+    variants: List[List[float]]  # montants dans l'ordre de scenario.expenses
+    residents: Optional[int] = Field(None, gt=0)
+    persist: bool = True
+
+class BudgetCalculationBatchResult(BaseModel):
+    scenario_id: str
+    budget: float
+    categories: List[str]
+    total_spent: List[float]
+    remaining: List[float]
+    is_over_budget: List[bool]
+    shares: List[List[float]]
+    per_resident: Optional[List[float]] = None
+    over_budget_count: int
+    persisted: int = 0
+
+class ExpenseUncertainty(BaseModel):
+    inflation_min: float = Field(0.0, gt=-1)  # ex. -0.05 pour -5 %
+    inflation_max: float = Field(0.0, gt=-1)
+    attendance_sd: float = Field(0.0, ge=0, le=1)  # écart-type relatif de la fréquentation
+
+class BudgetSimulationRequest(BaseModel):
+    uncertainty: Dict[str, ExpenseUncertainty] = {}  # par catégorie de dépense
+    default_uncertainty: ExpenseUncertainty = ExpenseUncertainty()
+    draws: int = Field(100_000, ge=1_000, le=200_000)
+    seed: Optional[int] = None
+    percentiles: List[confloat(ge=0, le=100)] = Field([5, 25, 50, 75, 95], min_length=1, max_length=20)
+
+class CategorySimulation(BaseModel):
+    category: str
+    amount: float
+    expected: float
+    percentiles: Dict[str, float]
+
+class BudgetSimulationResult(BaseModel):
+    scenario_id: str
+    budget: float
+    draws: int
+    seed: int
+    overspend_probability: float
+    expected_total: float
+    expected_remaining: float
+    total_percentiles: Dict[str, float]
+    remaining_percentiles: Dict[str, float]
+    categories: List[CategorySimulation]
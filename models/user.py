@@ -3,11 +3,10 @@ from typing import List, Optional
 from datetime import datetime
 import uuid
 
-class User(BaseModel):
+class UserPublic(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
     name: str
     email: str
-    hashed_password: str  # 🔐 nouveau champ
     avatar: str = "avatar1"
     level: int = 1
     xp: int = 0
@@ -17,6 +16,12 @@ class User(BaseModel):
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
+class User(UserPublic):
+    hashed_password: str  # 🔐 nouveau champ
+
+# Champs jamais lus depuis Mongo pour une réponse
+USER_PRIVATE_PROJECTION = {"hashed_password": 0}
+
 
 class UserCreate(BaseModel):
     name: str
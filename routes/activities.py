@@ -1,24 +1,37 @@
 from fastapi import APIRouter, HTTPException, Depends, Query
 from motor.motor_asyncio import AsyncIOMotorClient
 from typing import List, Optional
+from pydantic import TypeAdapter
 from datetime import datetime
+from pymongo import ReturnDocument
 
-from models.activity import ActivitySheet, ActivitySheetCreate, ActivitySheetUpdate, ActivityFilter
+from models.activity import ActivitySheet, ActivitySearchHit, ActivitySheetCreate, ActivitySheetUpdate, ActivityFilter
 from database import get_database
+from utils.auth import principal_cache
+from utils.batch import Batch, parse_ids, in_request_order, batch_adapter
+from utils.http import validated_json_response
+from utils.projection import select_fields, field_projection, partial_adapter, partial_list_adapter
+from utils.pagination import fetch_page, page_headers, PAGE_SIZE, MAX_PAGE_SIZE
+from utils.response_cache import response_cache
 
 router = APIRouter(prefix="/activities", tags=["activities"])
 
-@router.get("/", response_model=List[ActivitySheet])
-async def get_activities(
+activity_list_adapter = TypeAdapter(List[ActivitySheet])
+search_hit_list_adapter = TypeAdapter(List[ActivitySearchHit])
+
+SEARCH_MAX_LENGTH = 200
+
+# Cache de réponses, invalidé par le tag "activities" à chaque écriture
+ACTIVITY_LIST_CACHE_TTL = 30
+CATEGORIES_CACHE_TTL = 300
+
+def build_activity_filter(
     category: Optional[str] = None,
     difficulty: Optional[str] = None,
     author_id: Optional[str] = None,
-    search: Optional[str] = None,
-    is_public: Optional[bool] = True,
-    skip: int = 0,
-    limit: int = 100,
-    db: AsyncIOMotorClient = Depends(get_database)
-):
+    is_public: Optional[bool] = None,
+    search: Optional[str] = None
+) -> dict:
     filter_query = {}
     
     if category:
@@ -30,21 +43,94 @@ async def get_activities(
     if is_public is not None:
         filter_query["is_public"] = is_public
     if search:
-        filter_query["$or"] = [
-            {"title": {"$regex": search, "$options": "i"}},
-            {"description": {"$regex": search, "$options": "i"}},
-            {"category": {"$regex": search, "$options": "i"}}
-        ]
+        # Index texte (français) : pas de $regex, donc pas de scan complet
+        filter_query["$text"] = {"$search": search}
     
-    activities = await db.activities.find(filter_query).skip(skip).limit(limit).to_list(limit)
-    return [ActivitySheet(**activity) for activity in activities]
+    return filter_query
+
+def activity_list_view(fields: Optional[str], paginated: bool = True):
+    # (projection Mongo, adapter de réponse) pour ?fields=a,b
+    selected = select_fields(ActivitySheet, fields)
+    if selected is None:
+        return (None if paginated else {"_id": 0}), activity_list_adapter
+    keep = ("_id", "created_at") if paginated else ()
+    return field_projection(selected, keep), partial_list_adapter(ActivitySheet, selected)
+
+@router.get("/", response_model=List[ActivitySheet])
+@response_cache.cached("activities", ttl=ACTIVITY_LIST_CACHE_TTL)
+async def get_activities(
+    category: Optional[str] = None,
+    difficulty: Optional[str] = None,
+    author_id: Optional[str] = None,
+    search: Optional[str] = Query(None, max_length=SEARCH_MAX_LENGTH),
+    is_public: Optional[bool] = True,
+    cursor: Optional[str] = None,
+    skip: int = 0,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = None,
+    db: AsyncIOMotorClient = Depends(get_database)
+):
+    filter_query = build_activity_filter(category, difficulty, author_id, is_public, search)
+    
+    if search:
+        # Tri par pertinence : pas de curseur, pagination par skip
+        projection, adapter = activity_list_view(fields, paginated=False)
+        score = {"$meta": "textScore"}
+        activities = await db.activities.find(filter_query, projection).sort([("score", score)]).skip(skip).limit(limit).to_list(limit)
+        return validated_json_response(adapter, activities)
+    
+    projection, adapter = activity_list_view(fields)
+    activities, next_cursor = await fetch_page(db.activities, filter_query, "created_at", cursor, limit, projection, skip=skip)
+    return validated_json_response(adapter, activities, page_headers(next_cursor))
+
+@router.get("/search", response_model=List[ActivitySearchHit])
+async def search_activities(
+    q: str = Query(..., min_length=1, max_length=SEARCH_MAX_LENGTH),
+    category: Optional[str] = None,
+    difficulty: Optional[str] = None,
+    is_public: Optional[bool] = True,
+    limit: int = Query(20, ge=1, le=100),
+    fields: Optional[str] = None,
+    db: AsyncIOMotorClient = Depends(get_database)
+):
+    filter_query = build_activity_filter(category, difficulty, None, is_public, q)
+    score = {"$meta": "textScore"}
+    
+    selected = select_fields(ActivitySearchHit, fields, always=("id", "score"))
+    if selected is None:
+        projection, adapter = {"_id": 0}, search_hit_list_adapter
+    else:
+        projection = field_projection(tuple(name for name in selected if name != "score"))
+        adapter = partial_list_adapter(ActivitySearchHit, selected)
+    projection["score"] = score
+    
+    hits = await db.activities.find(filter_query, projection).sort([("score", score)]).limit(limit).to_list(limit)
+    return validated_json_response(adapter, hits)
+
+@router.get("/batch", response_model=Batch[ActivitySheet])
+async def get_activities_batch(
+    ids: str,
+    fields: Optional[str] = None,
+    db: AsyncIOMotorClient = Depends(get_database)
+):
+    # Une seule requête $in pour une liste d'ids (ex. User.created_activities)
+    requested = parse_ids(ids)
+    selected = select_fields(ActivitySheet, fields)
+    projection = {"_id": 0} if selected is None else field_projection(selected)
+    activities = await db.activities.find({"id": {"$in": requested}}, projection).to_list(len(requested))
+    items, missing = in_request_order(activities, requested)
+    return validated_json_response(batch_adapter(ActivitySheet, selected), {"items": items, "missing": missing})
 
 @router.get("/{activity_id}", response_model=ActivitySheet)
-async def get_activity(activity_id: str, db: AsyncIOMotorClient = Depends(get_database)):
-    activity = await db.activities.find_one({"id": activity_id})
+async def get_activity(activity_id: str, fields: Optional[str] = None, db: AsyncIOMotorClient = Depends(get_database)):
+    selected = select_fields(ActivitySheet, fields)
+    projection = {"_id": 0} if selected is None else field_projection(selected)
+    activity = await db.activities.find_one({"id": activity_id}, projection)
     if not activity:
         raise HTTPException(status_code=404, detail="Activity not found")
-    return ActivitySheet(**activity)
+    if selected is None:
+        return ActivitySheet(**activity)
+    return validated_json_response(partial_adapter(ActivitySheet, selected), activity)
 
 @router.post("/", response_model=ActivitySheet)
 async def create_activity(activity_data: ActivitySheetCreate, db: AsyncIOMotorClient = Depends(get_database)):
@@ -57,7 +143,9 @@ async def create_activity(activity_data: ActivitySheetCreate, db: AsyncIOMotorCl
             {"id": activity.author_id},
             {"$push": {"created_activities": activity.id}}
         )
+        principal_cache.invalidate_user(activity.author_id)
     
+    await response_cache.invalidate(db, "activities")
     return activity
 
 @router.put("/{activity_id}", response_model=ActivitySheet)
@@ -66,16 +154,17 @@ async def update_activity(
     activity_data: ActivitySheetUpdate, 
     db: AsyncIOMotorClient = Depends(get_database)
 ):
-    activity = await db.activities.find_one({"id": activity_id})
-    if not activity:
-        raise HTTPException(status_code=404, detail="Activity not found")
-    
     update_data = {k: v for k, v in activity_data.dict().items() if v is not None}
     update_data["updated_at"] = datetime.utcnow()
     
-    await db.activities.update_one({"id": activity_id}, {"$set": update_data})
-    
-    updated_activity = await db.activities.find_one({"id": activity_id})
+    updated_activity = await db.activities.find_one_and_update(
+        {"id": activity_id},
+        {"$set": update_data},
+        return_document=ReturnDocument.AFTER
+    )
+    if not updated_activity:
+        raise HTTPException(status_code=404, detail="Activity not found")
+    await response_cache.invalidate(db, "activities")
     return ActivitySheet(**updated_activity)
 
 @router.delete("/{activity_id}")
@@ -92,15 +181,25 @@ async def delete_activity(activity_id: str, db: AsyncIOMotorClient = Depends(get
             {"id": activity["author_id"]},
             {"$pull": {"created_activities": activity_id}}
         )
+        principal_cache.invalidate_user(activity["author_id"])
     
+    await response_cache.invalidate(db, "activities")
     return {"message": "Activity deleted successfully"}
 
 @router.get("/categories/list")
+@response_cache.cached("activities", ttl=CATEGORIES_CACHE_TTL)
 async def get_categories(db: AsyncIOMotorClient = Depends(get_database)):
     categories = await db.activities.distinct("category")
     return {"categories": categories}
 
 @router.get("/user/{user_id}", response_model=List[ActivitySheet])
-async def get_user_activities(user_id: str, db: AsyncIOMotorClient = Depends(get_database)):
-    activities = await db.activities.find({"author_id": user_id}).to_list(100)
-    return [ActivitySheet(**activity) for activity in activities]
\ No newline at end of file
+async def get_user_activities(
+    user_id: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = None,
+    db: AsyncIOMotorClient = Depends(get_database)
+):
+    projection, adapter = activity_list_view(fields)
+    activities, next_cursor = await fetch_page(db.activities, {"author_id": user_id}, "created_at", cursor, limit, projection)
+    return validated_json_response(adapter, activities, page_headers(next_cursor))
\ No newline at end of file
@@ -1,20 +1,15 @@
 from fastapi import APIRouter, HTTPException, Depends
-from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import BaseModel
 from models.user import User
-from utils.auth import get_password_hash, verify_password, create_access_token
+from utils.auth import password_hasher, PasswordHasherBusy, create_access_token, get_current_user
+from utils.profiler import profile_section
 from database import get_database
-from bson import ObjectId
-from jose import JWTError, jwt
-import os
-from dotenv import load_dotenv
+import logging
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
-SECRET_KEY = os.getenv("JWT_SECRET_KEY", "supersecret")
-ALGORITHM = "HS256"
 
 # ---------- Pydantic models ----------
 
@@ -36,7 +31,12 @@ async def register(user: UserRegister):
     if existing:
         raise HTTPException(status_code=400, detail="Email déjà utilisé")
 
-    hashed_pw = get_password_hash(user.password)
+    try:
+        with profile_section("password_hash"):
+            hashed_pw = await password_hasher.hash(user.password)
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Serveur occupé, réessayez", headers={"Retry-After": "1"})
+
     new_user = User(
         name=user.name,
         email=user.email,
@@ -54,38 +54,25 @@ async def login(user: UserLogin):
     stored = await db.users.find_one({"email": user.email})
 
     if not stored:
-        print("❌ Utilisateur non trouvé pour:", user.email)
-    elif not verify_password(user.password, stored["hashed_password"]):
-        print("❌ Mot de passe incorrect pour:", user.email)
-    else:
-        print("✅ Connexion réussie pour:", user.email)
+        logger.info("Login failed", extra={"reason": "unknown_user"})
+        raise HTTPException(status_code=400, detail="Identifiants invalides")
+
+    try:
+        with profile_section("password_hash"):
+            valid = await password_hasher.verify(user.password, stored["hashed_password"])
+    except PasswordHasherBusy:
+        raise HTTPException(status_code=503, detail="Serveur occupé, réessayez", headers={"Retry-After": "1"})
 
-    if not stored or not verify_password(user.password, stored["hashed_password"]):
+    if not valid:
+        logger.info("Login failed", extra={"reason": "bad_password", "user_id": str(stored["_id"])})
         raise HTTPException(status_code=400, detail="Identifiants invalides")
+    logger.info("Login succeeded", extra={"user_id": str(stored["_id"])})
 
     token = create_access_token({"sub": str(stored["_id"])})
-    print("🔐 Token généré:", token)
     return {"access_token": token, "token_type": "bearer"}
 
 # ---------- Protected route ----------
 
 @router.get("/me")
-async def get_me(access_token: str = Depends(oauth2_scheme)):
-    try:
-        payload = jwt.decode(access_token, SECRET_KEY, algorithms=[ALGORITHM])
-        print(payload)
-        user_id = payload.get("sub")
-        if user_id is None:
-            raise HTTPException(status_code=401, detail="Token invalide")
-    except JWTError:
-        raise HTTPException(status_code=401, detail="Token invalide")
-
-    db = await get_database()
-    user = await db.users.find_one({"_id": ObjectId(user_id)})
-    if not user:
-        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
-
-    user["id"] = str(user["_id"])
-    del user["_id"]
-    del user["hashed_password"]
-    return user
+async def get_me(current_user: dict = Depends(get_current_user)):
+    return dict(current_user)
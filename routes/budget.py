@@ -1,21 +1,42 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from motor.motor_asyncio import AsyncIOMotorClient
 from typing import List, Optional
+from pydantic import TypeAdapter
 from datetime import datetime
+import asyncio
+import hashlib
+import json
+import numpy as np
+from pymongo import ReturnDocument
 
-from models.budget import BudgetScenario, BudgetScenarioCreate, BudgetSession, BudgetCalculation
+from models.budget import (
+    BudgetScenario, BudgetScenarioCreate, BudgetSession, BudgetCalculation, BudgetCalculationBatch,
+    BudgetCalculationBatchResult, BudgetSimulationRequest, BudgetSimulationResult, CategorySimulation
+)
 from database import get_database
+from utils.budget_cache import budget_cache
+from utils.budget_engine import expense_matrix, evaluate_variants, simulate_spending, summarize_simulation
+from utils.http import validated_json_response
+from utils.pagination import fetch_page, page_headers, PAGE_SIZE, MAX_PAGE_SIZE
+from utils.response_cache import response_cache
 
 router = APIRouter(prefix="/budget", tags=["budget"])
 
+scenario_list_adapter = TypeAdapter(List[BudgetScenario])
+calculation_list_adapter = TypeAdapter(List[BudgetCalculation])
+
+BUDGET_BATCH_MAX_VARIANTS = 10000
+SCENARIO_LIST_CACHE_TTL = 300
+
 @router.get("/scenarios", response_model=List[BudgetScenario])
+@response_cache.cached("budget_scenarios", ttl=SCENARIO_LIST_CACHE_TTL)
 async def get_scenarios(db: AsyncIOMotorClient = Depends(get_database)):
-    scenarios = await db.budget_scenarios.find().to_list(100)
-    return [BudgetScenario(**scenario) for scenario in scenarios]
+    scenarios = await db.budget_scenarios.find({}, {"_id": 0}).to_list(100)
+    return validated_json_response(scenario_list_adapter, scenarios)
 
 @router.get("/scenarios/{scenario_id}", response_model=BudgetScenario)
 async def get_scenario(scenario_id: str, db: AsyncIOMotorClient = Depends(get_database)):
-    scenario = await db.budget_scenarios.find_one({"id": scenario_id})
+    scenario = await budget_cache.get(db, scenario_id)
     if not scenario:
         raise HTTPException(status_code=404, detail="Scenario not found")
     return BudgetScenario(**scenario)
@@ -24,8 +45,70 @@ async def get_scenario(scenario_id: str, db: AsyncIOMotorClient = Depends(get_da
 async def create_scenario(scenario_data: BudgetScenarioCreate, db: AsyncIOMotorClient = Depends(get_database)):
     scenario = BudgetScenario(**scenario_data.dict())
     await db.budget_scenarios.insert_one(scenario.dict())
+    budget_cache.put(scenario.dict())
+    await response_cache.invalidate(db, "budget_scenarios")
     return scenario
 
+def run_simulation(scenario: dict, params: BudgetSimulationRequest, seed: int) -> BudgetSimulationResult:
+    expenses = scenario["expenses"]
+    uncertainties = [params.uncertainty.get(expense["category"], params.default_uncertainty) for expense in expenses]
+    spending = simulate_spending(
+        np.array([expense["amount"] for expense in expenses], dtype=np.float64),
+        np.array([u.inflation_min for u in uncertainties]),
+        np.array([u.inflation_max for u in uncertainties]),
+        np.array([u.attendance_sd for u in uncertainties]),
+        params.draws,
+        np.random.default_rng(seed)
+    )
+    summary = summarize_simulation(scenario["budget"], spending, params.percentiles)
+    labels = [f"p{percentile:g}" for percentile in params.percentiles]
+    
+    return BudgetSimulationResult(
+        scenario_id=scenario["id"],
+        budget=scenario["budget"],
+        draws=params.draws,
+        seed=seed,
+        overspend_probability=summary["overspend_probability"],
+        expected_total=summary["expected_total"],
+        expected_remaining=summary["expected_remaining"],
+        total_percentiles=dict(zip(labels, summary["total_percentiles"])),
+        remaining_percentiles=dict(zip(labels, summary["remaining_percentiles"])),
+        categories=[
+            CategorySimulation(
+                category=expense["category"],
+                amount=expense["amount"],
+                expected=expected,
+                percentiles=dict(zip(labels, values))
+            )
+            for expense, expected, values in zip(expenses, summary["category_means"], summary["category_percentiles"])
+        ]
+    )
+
+@router.post("/scenarios/{scenario_id}/simulate", response_model=BudgetSimulationResult)
+async def simulate_scenario(scenario_id: str, params: BudgetSimulationRequest, db: AsyncIOMotorClient = Depends(get_database)):
+    scenario = await budget_cache.get(db, scenario_id)
+    if not scenario:
+        raise HTTPException(status_code=404, detail="Scenario not found")
+    
+    categories = {expense["category"] for expense in scenario["expenses"]}
+    unknown = set(params.uncertainty) - categories
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown categories: {', '.join(sorted(unknown))}")
+    for uncertainty in [params.default_uncertainty, *params.uncertainty.values()]:
+        if uncertainty.inflation_min > uncertainty.inflation_max:
+            raise HTTPException(status_code=400, detail="inflation_min must not exceed inflation_max")
+    
+    # Scénarios immuables : le résultat ne dépend que des paramètres
+    params_hash = hashlib.sha256(json.dumps(params.dict(), sort_keys=True).encode()).hexdigest()
+    cache_key = (scenario_id, params_hash)
+    result = budget_cache.simulations.get(cache_key)
+    if result is None:
+        # Sans graine explicite, la graine dérive des paramètres : résultats reproductibles
+        seed = params.seed if params.seed is not None else int(params_hash[:16], 16)
+        result = await asyncio.to_thread(run_simulation, scenario, params, seed)
+        budget_cache.simulations.set(cache_key, result)
+    return result
+
 @router.post("/sessions", response_model=BudgetSession)
 async def start_budget_session(
     user_id: str, 
@@ -33,7 +116,7 @@ async def start_budget_session(
     db: AsyncIOMotorClient = Depends(get_database)
 ):
     # Verify scenario exists
-    scenario = await db.budget_scenarios.find_one({"id": scenario_id})
+    scenario = await budget_cache.get(db, scenario_id)
     if not scenario:
         raise HTTPException(status_code=404, detail="Scenario not found")
     
@@ -43,6 +126,7 @@ async def start_budget_session(
     )
     
     await db.budget_sessions.insert_one(session.dict())
+    budget_cache.remember_session(session.id, scenario_id)
     return session
 
 @router.get("/sessions/{session_id}", response_model=BudgetSession)
@@ -59,42 +143,49 @@ async def submit_budget_answer(
     user_answer: int,
     db: AsyncIOMotorClient = Depends(get_database)
 ):
-    session = await db.budget_sessions.find_one({"id": session_id})
-    if not session:
+    scenario_id = await budget_cache.scenario_id_for_session(db, session_id)
+    if not scenario_id:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    scenario = await db.budget_scenarios.find_one({"id": session["scenario_id"]})
+    scenario = await budget_cache.get(db, scenario_id)
     if not scenario:
         raise HTTPException(status_code=404, detail="Scenario not found")
     
-    if question_index >= len(scenario["questions"]):
+    questions = scenario["questions"]
+    if question_index < 0 or question_index >= len(questions):
         raise HTTPException(status_code=400, detail="Invalid question index")
     
-    question = scenario["questions"][question_index]
+    question = questions[question_index]
     is_correct = user_answer == question["correct_answer"]
     
-    # Update session
-    new_score = session["score"] + (1 if is_correct else 0)
-    new_answers = session["answers"] + [user_answer]
-    
-    update_data = {
-        "score": new_score,
-        "answers": new_answers
-    }
-    
-    # Check if all questions are answered
-    if len(new_answers) >= len(scenario["questions"]):
-        update_data["completed"] = True
-        update_data["completed_at"] = datetime.utcnow()
-    
-    await db.budget_sessions.update_one({"id": session_id}, {"$set": update_data})
+    # Une seule écriture, conditionnée à l'ordre des réponses
+    session = await db.budget_sessions.find_one_and_update(
+        {"id": session_id, "completed": False, "answers": {"$size": question_index}},
+        [
+            {"$set": {
+                "score": {"$add": ["$score", 1 if is_correct else 0]},
+                "answers": {"$concatArrays": ["$answers", [user_answer]]}
+            }},
+            {"$set": {"completed": {"$gte": [{"$size": "$answers"}, len(questions)]}}},
+            {"$set": {"completed_at": {"$cond": ["$completed", datetime.utcnow(), None]}}}
+        ],
+        projection={"_id": 0, "score": 1, "completed": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if not session:
+        existing = await db.budget_sessions.find_one({"id": session_id}, {"_id": 0, "completed": 1})
+        if not existing:
+            raise HTTPException(status_code=404, detail="Session not found")
+        if existing["completed"]:
+            raise HTTPException(status_code=400, detail="Session already completed")
+        raise HTTPException(status_code=409, detail="Question already answered or not the current question")
     
     return {
         "is_correct": is_correct,
         "correct_answer": question["correct_answer"],
         "explanation": question.get("explanation", ""),
-        "score": new_score,
-        "completed": update_data.get("completed", False)
+        "score": session["score"],
+        "completed": session["completed"]
     }
 
 @router.get("/sessions/{session_id}/results")
@@ -103,7 +194,7 @@ async def get_budget_results(session_id: str, db: AsyncIOMotorClient = Depends(g
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    scenario = await db.budget_scenarios.find_one({"id": session["scenario_id"]})
+    scenario = await budget_cache.get(db, session["scenario_id"])
     if not scenario:
         raise HTTPException(status_code=404, detail="Scenario not found")
     
@@ -125,10 +216,74 @@ async def get_budget_results(session_id: str, db: AsyncIOMotorClient = Depends(g
 
 @router.post("/calculations", response_model=BudgetCalculation)
 async def save_budget_calculation(calculation: BudgetCalculation, db: AsyncIOMotorClient = Depends(get_database)):
+    # Les totaux sont recalculés côté serveur
+    calculation.total_spent = sum(expense.amount for expense in calculation.categories)
+    calculation.remaining = calculation.total_budget - calculation.total_spent
+    calculation.is_over_budget = calculation.total_spent > calculation.total_budget
     await db.budget_calculations.insert_one(calculation.dict())
     return calculation
 
+@router.post("/calculations/batch", response_model=BudgetCalculationBatchResult)
+async def evaluate_budget_batch(batch: BudgetCalculationBatch, db: AsyncIOMotorClient = Depends(get_database)):
+    scenario = await budget_cache.get(db, batch.scenario_id)
+    if not scenario:
+        raise HTTPException(status_code=404, detail="Scenario not found")
+    
+    if not batch.variants or len(batch.variants) > BUDGET_BATCH_MAX_VARIANTS:
+        raise HTTPException(status_code=400, detail=f"Between 1 and {BUDGET_BATCH_MAX_VARIANTS} variants are required")
+    
+    categories = [expense["category"] for expense in scenario["expenses"]]
+    try:
+        expenses = expense_matrix(batch.variants, len(categories))
+    except ValueError as error:
+        raise HTTPException(status_code=400, detail=str(error))
+    
+    budget = scenario["budget"]
+    residents = batch.residents or scenario.get("residents")
+    result = evaluate_variants(budget, expenses, residents)
+    
+    persisted = 0
+    if batch.persist:
+        now = datetime.utcnow()
+        documents = [
+            {
+                "user_id": batch.user_id,
+                "total_budget": budget,
+                "categories": [{"category": category, "amount": amount} for category, amount in zip(categories, amounts)],
+                "total_spent": total_spent,
+                "remaining": remaining,
+                "is_over_budget": is_over_budget,
+                "created_at": now
+            }
+            for amounts, total_spent, remaining, is_over_budget in zip(
+                expenses.tolist(),
+                result["total_spent"].tolist(),
+                result["remaining"].tolist(),
+                result["is_over_budget"].tolist()
+            )
+        ]
+        await db.budget_calculations.insert_many(documents, ordered=False)
+        persisted = len(documents)
+    
+    return BudgetCalculationBatchResult(
+        scenario_id=batch.scenario_id,
+        budget=budget,
+        categories=categories,
+        total_spent=result["total_spent"].tolist(),
+        remaining=result["remaining"].tolist(),
+        is_over_budget=result["is_over_budget"].tolist(),
+        shares=result["shares"].tolist(),
+        per_resident=result["per_resident"].tolist() if result["per_resident"] is not None else None,
+        over_budget_count=int(result["is_over_budget"].sum()),
+        persisted=persisted
+    )
+
 @router.get("/calculations/{user_id}", response_model=List[BudgetCalculation])
-async def get_user_calculations(user_id: str, db: AsyncIOMotorClient = Depends(get_database)):
-    calculations = await db.budget_calculations.find({"user_id": user_id}).to_list(100)
-    return [BudgetCalculation(**calc) for calc in calculations]
\ No newline at end of file
+async def get_user_calculations(
+    user_id: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncIOMotorClient = Depends(get_database)
+):
+    calculations, next_cursor = await fetch_page(db.budget_calculations, {"user_id": user_id}, "created_at", cursor, limit)
+    return validated_json_response(calculation_list_adapter, calculations, page_headers(next_cursor))
\ No newline at end of file
@@ -0,0 +1,81 @@
+from fastapi import APIRouter, HTTPException, Depends, Header, Query
+from fastapi.responses import PlainTextResponse
+from typing import Optional
+import os
+
+from database import get_pool_settings
+from settings import INTERNAL_API_TOKEN, internal_token_valid
+from utils.auth import password_hasher, principal_cache
+from utils.budget_cache import budget_cache
+from utils.mongo_monitor import pool_monitor, command_monitor
+from utils.profiler import profiler
+from utils.live_quiz import live_quiz_registry
+from utils.metrics import metrics
+from utils.question_bank import question_bank
+from utils.response_cache import response_cache
+from utils.write_behind import quiz_answers_buffer
+from utils.ws_hub import hub
+
+async def require_internal_access(x_internal_token: Optional[str] = Header(None)):
+    # Sans INTERNAL_API_TOKEN configuré, les endpoints internes n'existent pas
+    if not INTERNAL_API_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not internal_token_valid(x_internal_token):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+router = APIRouter(prefix="/internal", tags=["internal"], dependencies=[Depends(require_internal_access)])
+
+@router.get("/password-hasher")
+async def get_password_hasher_stats():
+    return password_hasher.stats()
+
+@router.get("/principal-cache")
+async def get_principal_cache_stats():
+    return principal_cache.stats()
+
+@router.get("/mongo")
+async def get_mongo_stats():
+    settings = get_pool_settings()
+    workers = int(os.getenv("WEB_CONCURRENCY", "1"))
+    return {
+        "settings": settings,
+        "workers": workers,
+        # Nombre maximal de connexions ouvertes par l'ensemble des workers
+        "max_connections": settings.get("maxPoolSize", 100) * workers,
+        "pools": pool_monitor.stats(),
+        "commands": command_monitor.stats(),
+    }
+
+@router.get("/question-bank")
+async def get_question_bank_stats():
+    return question_bank.stats()
+
+@router.get("/write-behind")
+async def get_write_behind_stats():
+    return [quiz_answers_buffer.stats()]
+
+@router.get("/budget-cache")
+async def get_budget_cache_stats():
+    return budget_cache.stats()
+
+@router.get("/response-cache")
+async def get_response_cache_stats():
+    return response_cache.stats()
+
+@router.get("/websockets")
+async def get_websocket_stats():
+    return hub.stats()
+
+@router.get("/live-quiz")
+async def get_live_quiz_stats():
+    return live_quiz_registry.stats()
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    # Format texte Prometheus
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@router.get("/profiles")
+async def get_profiles(limit: int = Query(50, ge=1, le=500), min_ms: float = Query(0, ge=0)):
+    # Requêtes profilées les plus récentes (X-Profile: 1 ou PROFILE_SAMPLE_RATE)
+    return {**profiler.stats(), "profiles": profiler.recent(limit, min_ms)}
@@ -1,23 +1,59 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query, WebSocket, WebSocketDisconnect
 from motor.motor_asyncio import AsyncIOMotorClient
 from typing import List, Optional
+from pydantic import TypeAdapter
 from datetime import datetime
+from pymongo import ReturnDocument
+import asyncio
+import json
 import random
 
 from models.quiz import QuizQuestion, QuizQuestionCreate, QuizTheme, QuizSession, QuizAnswer
 from database import get_database
+from utils.batch import Batch, parse_ids, in_request_order, batch_adapter
+from utils.http import validated_json_response
+from utils.live_quiz import live_quiz_registry, LiveQuizError, unclaimed
+from utils.projection import select_fields, field_projection, partial_adapter, partial_list_adapter
+from utils.question_bank import question_bank
+from utils.response_cache import response_cache
+from utils.write_behind import quiz_answers_buffer
+from utils.ws_hub import hub, WS_IDLE_TIMEOUT, CLOSE_POLICY_VIOLATION
+
+QUIZ_MAX_QUESTIONS = 100
+THEMES_CACHE_TTL = 300
 
 router = APIRouter(prefix="/quiz", tags=["quiz"])
 
+theme_list_adapter = TypeAdapter(List[QuizTheme])
+question_list_adapter = TypeAdapter(List[QuizQuestion])
+
 @router.get("/themes", response_model=List[QuizTheme])
-async def get_themes(db: AsyncIOMotorClient = Depends(get_database)):
-    themes = await db.quiz_themes.find().sort("order", 1).to_list(100)
-    return [QuizTheme(**theme) for theme in themes]
+@response_cache.cached("quiz", ttl=THEMES_CACHE_TTL)
+async def get_themes(fields: Optional[str] = None, db: AsyncIOMotorClient = Depends(get_database)):
+    selected = select_fields(QuizTheme, fields)
+    if selected is None:
+        projection, adapter = {"_id": 0}, theme_list_adapter
+    else:
+        projection, adapter = field_projection(selected), partial_list_adapter(QuizTheme, selected)
+    themes = await db.quiz_themes.find({}, projection).sort("order", 1).to_list(100)
+    return validated_json_response(adapter, themes)
 
 @router.get("/themes/{theme_id}/questions", response_model=List[QuizQuestion])
-async def get_theme_questions(theme_id: str, db: AsyncIOMotorClient = Depends(get_database)):
-    questions = await db.quiz_questions.find({"theme": theme_id}).to_list(100)
-    return [QuizQuestion(**question) for question in questions]
+async def get_theme_questions(theme_id: str, fields: Optional[str] = None, db: AsyncIOMotorClient = Depends(get_database)):
+    # Servies depuis la banque en mémoire : seule la réponse est réduite
+    selected = select_fields(QuizQuestion, fields)
+    adapter = question_list_adapter if selected is None else partial_list_adapter(QuizQuestion, selected)
+    questions = await question_bank.questions(db, theme_id)
+    return validated_json_response(adapter, questions[:QUIZ_MAX_QUESTIONS])
+
+@router.get("/questions", response_model=Batch[QuizQuestion])
+async def get_questions_batch(ids: str, fields: Optional[str] = None, db: AsyncIOMotorClient = Depends(get_database)):
+    # Revue d'une QuizSession.questions : servie depuis la banque en mémoire
+    requested = parse_ids(ids)
+    selected = select_fields(QuizQuestion, fields)
+    found = await question_bank.get_many(db, requested)
+    items, missing = in_request_order(found.values(), requested)
+    return validated_json_response(batch_adapter(QuizQuestion, selected), {"items": items, "missing": missing})
 
 @router.post("/questions", response_model=QuizQuestion)
 async def create_question(question_data: QuizQuestionCreate, db: AsyncIOMotorClient = Depends(get_database)):
@@ -29,19 +65,26 @@ async def create_question(question_data: QuizQuestionCreate, db: AsyncIOMotorCli
         {"id": question.theme},
         {"$inc": {"questions_count": 1}}
     )
+    await question_bank.add(db, question.dict())
+    # questions_count des thèmes a changé
+    await response_cache.invalidate(db, "quiz")
     
     return question
 
 @router.post("/sessions", response_model=QuizSession)
-async def start_quiz_session(user_id: str, theme: str, db: AsyncIOMotorClient = Depends(get_database)):
-    # Get all questions for the theme
-    questions = await db.quiz_questions.find({"theme": theme}).to_list(100)
-    if not questions:
+async def start_quiz_session(
+    user_id: str,
+    theme: str,
+    count: Optional[int] = Query(None, ge=1, le=QUIZ_MAX_QUESTIONS),
+    db: AsyncIOMotorClient = Depends(get_database)
+):
+    # Tirage aléatoire sur les ids en mémoire, sans charger les documents
+    theme_question_ids = await question_bank.question_ids(db, theme)
+    if not theme_question_ids:
         raise HTTPException(status_code=404, detail="No questions found for this theme")
     
-    # Randomize questions
-    random.shuffle(questions)
-    question_ids = [q["id"] for q in questions]
+    sample_size = min(count or QUIZ_MAX_QUESTIONS, len(theme_question_ids))
+    question_ids = random.sample(theme_question_ids, sample_size)
     
     session = QuizSession(
         user_id=user_id,
@@ -53,11 +96,17 @@ async def start_quiz_session(user_id: str, theme: str, db: AsyncIOMotorClient =
     return session
 
 @router.get("/sessions/{session_id}", response_model=QuizSession)
-async def get_quiz_session(session_id: str, db: AsyncIOMotorClient = Depends(get_database)):
-    session = await db.quiz_sessions.find_one({"id": session_id})
+async def get_quiz_session(session_id: str, fields: Optional[str] = None, db: AsyncIOMotorClient = Depends(get_database)):
+    selected = select_fields(QuizSession, fields)
+    projection = {"_id": 0} if selected is None else field_projection(selected)
+    # Une session jouée en WebSocket est plus à jour en mémoire qu'en base
+    live = live_quiz_registry.get(session_id)
+    session = live.session if live else await db.quiz_sessions.find_one({"id": session_id}, projection)
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
-    return QuizSession(**session)
+    if selected is None:
+        return QuizSession(**session)
+    return validated_json_response(partial_adapter(QuizSession, selected), session)
 
 @router.post("/sessions/{session_id}/answer")
 async def submit_answer(
@@ -66,53 +115,67 @@ async def submit_answer(
     user_answer: int, 
     db: AsyncIOMotorClient = Depends(get_database)
 ):
-    session = await db.quiz_sessions.find_one({"id": session_id})
-    if not session:
-        raise HTTPException(status_code=404, detail="Session not found")
-    
-    question = await db.quiz_questions.find_one({"id": question_id})
+    if live_quiz_registry.get(session_id):
+        raise HTTPException(status_code=409, detail="Session is being played live")
+
+    question = await question_bank.get(db, question_id)
     if not question:
         raise HTTPException(status_code=404, detail="Question not found")
     
     is_correct = user_answer == question["correct_answer"]
     
-    # Save answer
+    # Mise à jour conditionnelle : seule la question courante peut être
+    # répondue, ce qui rend les doubles clics inoffensifs.
+    session = await db.quiz_sessions.find_one_and_update(
+        {
+            "id": session_id,
+            "completed": False,
+            **unclaimed(),
+            "$expr": {"$eq": [{"$arrayElemAt": ["$questions", "$current_question"]}, question_id]}
+        },
+        [
+            {"$set": {
+                "score": {"$add": ["$score", 1 if is_correct else 0]},
+                "current_question": {"$add": ["$current_question", 1]},
+                "answers": {"$concatArrays": [{"$ifNull": ["$answers", []]}, [user_answer]]}
+            }},
+            {"$set": {"completed": {"$gte": ["$current_question", {"$size": "$questions"}]}}},
+            {"$set": {"completed_at": {"$cond": ["$completed", datetime.utcnow(), None]}}}
+        ],
+        projection={"_id": 0, "score": 1, "completed": 1},
+        return_document=ReturnDocument.AFTER
+    )
+    if not session:
+        existing = await db.quiz_sessions.find_one({"id": session_id}, {"_id": 0, "completed": 1, "live_expires_at": 1})
+        if not existing:
+            raise HTTPException(status_code=404, detail="Session not found")
+        if existing["completed"]:
+            raise HTTPException(status_code=400, detail="Quiz already completed")
+        if existing.get("live_expires_at") and existing["live_expires_at"] > datetime.utcnow():
+            raise HTTPException(status_code=409, detail="Session is being played live")
+        raise HTTPException(status_code=409, detail="Question already answered or not the current question")
+    
+    # Trace de la réponse, écrite par lots
     answer = QuizAnswer(
         session_id=session_id,
         question_id=question_id,
         user_answer=user_answer,
         is_correct=is_correct
     )
-    await db.quiz_answers.insert_one(answer.dict())
-    
-    # Update session
-    new_score = session["score"] + (1 if is_correct else 0)
-    new_current_question = session["current_question"] + 1
-    
-    update_data = {
-        "score": new_score,
-        "current_question": new_current_question,
-        "$push": {"answers": user_answer}
-    }
-    
-    # Check if quiz is completed
-    if new_current_question >= len(session["questions"]):
-        update_data["completed"] = True
-        update_data["completed_at"] = datetime.utcnow()
-    
-    await db.quiz_sessions.update_one({"id": session_id}, {"$set": update_data})
+    quiz_answers_buffer.add(answer.dict())
     
     return {
         "is_correct": is_correct,
         "correct_answer": question["correct_answer"],
         "explanation": question["explanation"],
-        "score": new_score,
-        "completed": update_data.get("completed", False)
+        "score": session["score"],
+        "completed": session["completed"]
     }
 
 @router.get("/sessions/{session_id}/results")
 async def get_quiz_results(session_id: str, db: AsyncIOMotorClient = Depends(get_database)):
-    session = await db.quiz_sessions.find_one({"id": session_id})
+    live = live_quiz_registry.get(session_id)
+    session = live.session if live else await db.quiz_sessions.find_one({"id": session_id})
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
@@ -130,4 +193,90 @@ async def get_quiz_results(session_id: str, db: AsyncIOMotorClient = Depends(get
         "passed": percentage >= 70,
         "theme": session["theme"],
         "completed_at": session["completed_at"]
-    }
\ No newline at end of file
+    }
+
+def live_question(live, index: int) -> dict:
+    question = live.current()
+    return {
+        "type": "question",
+        "index": index,
+        "total": len(live.session["questions"]),
+        "question": {key: question[key] for key in ("id", "question", "options", "theme", "difficulty")}
+    }
+
+def live_results(session: dict) -> dict:
+    total_questions = len(session["questions"])
+    percentage = (session["score"] / total_questions) * 100
+    return {
+        "type": "completed",
+        "score": session["score"],
+        "total_questions": total_questions,
+        "percentage": percentage,
+        "passed": percentage >= 70
+    }
+
+@router.websocket("/sessions/{session_id}/live")
+async def play_quiz_session(websocket: WebSocket, session_id: str):
+    # Mode WebSocket : la session reste en mémoire, les réponses sont
+    # corrigées localement et la progression est écrite en différé.
+    # Client -> {"action": "answer", "question_id": ..., "user_answer": ...}
+    db = await get_database()
+    await websocket.accept()
+    try:
+        live = await live_quiz_registry.attach(db, session_id)
+    except LiveQuizError as error:
+        await websocket.send_json({"type": "error", "status": error.status_code, "detail": error.detail})
+        await websocket.close(code=CLOSE_POLICY_VIOLATION)
+        return
+
+    room = f"quiz:{session_id}"
+    try:
+        session = live.session
+        if session["completed"]:
+            await websocket.send_json(live_results(session))
+            return
+        await websocket.send_json(live_question(live, session["current_question"]))
+
+        while not session["completed"]:
+            text = await asyncio.wait_for(websocket.receive_text(), WS_IDLE_TIMEOUT)
+            try:
+                message = json.loads(text)
+            except ValueError:
+                await websocket.send_json({"type": "error", "status": 400, "detail": "Invalid message"})
+                continue
+            if not isinstance(message, dict) or message.get("action") != "answer":
+                continue
+            try:
+                question_id = str(message["question_id"])
+                user_answer = int(message["user_answer"])
+            except (KeyError, TypeError, ValueError):
+                await websocket.send_json({"type": "error", "status": 422, "detail": "question_id and user_answer are required"})
+                continue
+            try:
+                result = live_quiz_registry.answer(live, question_id, user_answer)
+            except LiveQuizError as error:
+                await websocket.send_json({"type": "error", "status": error.status_code, "detail": error.detail})
+                continue
+
+            quiz_answers_buffer.add(QuizAnswer(
+                session_id=session_id,
+                question_id=question_id,
+                user_answer=user_answer,
+                is_correct=result["is_correct"]
+            ).dict())
+            # Suivi en direct pour un tableau de bord abonné à la salle
+            hub.broadcast(room, {"type": "progress", "session_id": session_id, "score": result["score"], "current_question": session["current_question"]})
+
+            await websocket.send_json({"type": "result", **result})
+            if result["completed"]:
+                await live_quiz_registry.checkpoint(session_id)
+                await websocket.send_json(live_results(session))
+            else:
+                await websocket.send_json(live_question(live, session["current_question"]))
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+    except asyncio.TimeoutError:
+        await websocket.close(code=CLOSE_POLICY_VIOLATION)
+    finally:
+        await live_quiz_registry.detach(session_id)
@@ -1,14 +1,24 @@
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Query
 from motor.motor_asyncio import AsyncIOMotorClient
-from typing import List
+from typing import List, Optional
+from pydantic import TypeAdapter
 from datetime import datetime
+from pymongo import ReturnDocument
 
-from models.user import User, UserCreate, UserUpdate, UserProgress
+from models.user import User, UserPublic, UserCreate, UserUpdate, UserProgress, USER_PRIVATE_PROJECTION
 from database import get_database
+from utils.auth import principal_cache
+from utils.batch import Batch, parse_ids, in_request_order, batch_adapter
+from utils.http import validated_json_response
+from utils.projection import select_fields, field_projection, partial_adapter, partial_list_adapter
+from utils.pagination import fetch_page, page_headers, PAGE_SIZE, MAX_PAGE_SIZE
 
 router = APIRouter(prefix="/users", tags=["users"])
 
-@router.post("/", response_model=User)
+user_list_adapter = TypeAdapter(List[UserPublic])
+progress_list_adapter = TypeAdapter(List[UserProgress])
+
+@router.post("/", response_model=UserPublic)
 async def create_user(user_data: UserCreate, db: AsyncIOMotorClient = Depends(get_database)):
     existing_user = await db.users.find_one({"email": user_data.email})
     if existing_user:
@@ -18,82 +28,99 @@ async def create_user(user_data: UserCreate, db: AsyncIOMotorClient = Depends(ge
     await db.users.insert_one(user.dict())
     return user
 
-@router.get("/", response_model=List[User])
-async def list_users(db: AsyncIOMotorClient = Depends(get_database)):
-    users_cursor = db.users.find()
-    users = await users_cursor.to_list(100)
-    return [User(**user) for user in users]
+@router.get("/", response_model=List[UserPublic])
+async def list_users(
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    fields: Optional[str] = None,
+    db: AsyncIOMotorClient = Depends(get_database)
+):
+    selected = select_fields(UserPublic, fields)
+    if selected is None:
+        users, next_cursor = await fetch_page(db.users, {}, "created_at", cursor, limit, USER_PRIVATE_PROJECTION)
+        return validated_json_response(user_list_adapter, users, page_headers(next_cursor))
+    
+    projection = field_projection(selected, keep=("_id", "created_at"))
+    users, next_cursor = await fetch_page(db.users, {}, "created_at", cursor, limit, projection)
+    return validated_json_response(partial_list_adapter(UserPublic, selected), users, page_headers(next_cursor))
 
-@router.get("/{user_id}", response_model=User)
-async def get_user(user_id: str, db: AsyncIOMotorClient = Depends(get_database)):
-    user = await db.users.find_one({"id": user_id})
+async def find_user(db, query: dict, fields: Optional[str]):
+    selected = select_fields(UserPublic, fields)
+    projection = USER_PRIVATE_PROJECTION if selected is None else field_projection(selected)
+    user = await db.users.find_one(query, projection)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return User(**user)
+    if selected is None:
+        return UserPublic(**user)
+    return validated_json_response(partial_adapter(UserPublic, selected), user)
+
+@router.get("/batch", response_model=Batch[UserPublic])
+async def get_users_batch(ids: str, fields: Optional[str] = None, db: AsyncIOMotorClient = Depends(get_database)):
+    requested = parse_ids(ids)
+    selected = select_fields(UserPublic, fields)
+    projection = USER_PRIVATE_PROJECTION if selected is None else field_projection(selected)
+    users = await db.users.find({"id": {"$in": requested}}, projection).to_list(len(requested))
+    items, missing = in_request_order(users, requested)
+    return validated_json_response(batch_adapter(UserPublic, selected), {"items": items, "missing": missing})
+
+@router.get("/{user_id}", response_model=UserPublic)
+async def get_user(user_id: str, fields: Optional[str] = None, db: AsyncIOMotorClient = Depends(get_database)):
+    return await find_user(db, {"id": user_id}, fields)
+
+@router.get("/email/{email}", response_model=UserPublic)
+async def get_user_by_email(email: str, fields: Optional[str] = None, db: AsyncIOMotorClient = Depends(get_database)):
+    return await find_user(db, {"email": email}, fields)
+
+# Le niveau est toujours recalculé côté Mongo à partir de l'XP
+XP_PER_LEVEL = 100
+LEVEL_FROM_XP = {"$toInt": {"$add": [{"$floor": {"$divide": ["$xp", XP_PER_LEVEL]}}, 1]}}
 
-@router.get("/email/{email}", response_model=User)
-async def get_user_by_email(email: str, db: AsyncIOMotorClient = Depends(get_database)):
-    user = await db.users.find_one({"email": email})
+async def update_user_document(db, user_id: str, update) -> UserPublic:
+    user = await db.users.find_one_and_update(
+        {"id": user_id},
+        update,
+        projection=USER_PRIVATE_PROJECTION,
+        return_document=ReturnDocument.AFTER
+    )
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
-    return User(**user)
+    principal_cache.invalidate_user(user_id)
+    return UserPublic(**user)
 
-@router.put("/{user_id}", response_model=User)
+@router.put("/{user_id}", response_model=UserPublic)
 async def update_user(user_id: str, user_data: UserUpdate, db: AsyncIOMotorClient = Depends(get_database)):
-    user = await db.users.find_one({"id": user_id})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    update_data = {k: v for k, v in user_data.dict().items() if v is not None}
+    update_data = {k: v for k, v in user_data.dict().items() if v is not None and k != "level"}
     update_data["updated_at"] = datetime.utcnow()
     
-    await db.users.update_one({"id": user_id}, {"$set": update_data})
-    updated_user = await db.users.find_one({"id": user_id})
-    return User(**updated_user)
+    if "xp" not in update_data:
+        return await update_user_document(db, user_id, {"$set": update_data})
+    
+    # Pipeline : $literal évite que des valeurs commençant par "$" soient lues comme des champs
+    return await update_user_document(db, user_id, [
+        {"$set": {k: {"$literal": v} for k, v in update_data.items()}},
+        {"$set": {"level": LEVEL_FROM_XP}},
+    ])
 
-@router.post("/{user_id}/xp")
+@router.post("/{user_id}/xp", response_model=UserPublic)
 async def add_xp(user_id: str, xp_points: int, db: AsyncIOMotorClient = Depends(get_database)):
-    user = await db.users.find_one({"id": user_id})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    new_xp = user.get("xp", 0) + xp_points
-    new_level = (new_xp // 100) + 1
-    
-    await db.users.update_one(
-        {"id": user_id}, 
-        {"$set": {"xp": new_xp, "level": new_level, "updated_at": datetime.utcnow()}}
-    )
-    updated_user = await db.users.find_one({"id": user_id})
-    return User(**updated_user)
+    return await update_user_document(db, user_id, [
+        {"$set": {"xp": {"$add": [{"$ifNull": ["$xp", 0]}, xp_points]}, "updated_at": datetime.utcnow()}},
+        {"$set": {"level": LEVEL_FROM_XP}},
+    ])
 
-@router.post("/{user_id}/badges")
+@router.post("/{user_id}/badges", response_model=UserPublic)
 async def add_badge(user_id: str, badge_id: str, db: AsyncIOMotorClient = Depends(get_database)):
-    user = await db.users.find_one({"id": user_id})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    if badge_id not in user.get("badges", []):
-        await db.users.update_one(
-            {"id": user_id}, 
-            {"$push": {"badges": badge_id}, "$set": {"updated_at": datetime.utcnow()}}
-        )
-    updated_user = await db.users.find_one({"id": user_id})
-    return User(**updated_user)
-
-@router.post("/{user_id}/complete-theme")
+    return await update_user_document(db, user_id, {
+        "$addToSet": {"badges": badge_id},
+        "$set": {"updated_at": datetime.utcnow()}
+    })
+
+@router.post("/{user_id}/complete-theme", response_model=UserPublic)
 async def complete_theme(user_id: str, theme: str, db: AsyncIOMotorClient = Depends(get_database)):
-    user = await db.users.find_one({"id": user_id})
-    if not user:
-        raise HTTPException(status_code=404, detail="User not found")
-    
-    if theme not in user.get("completed_themes", []):
-        await db.users.update_one(
-            {"id": user_id}, 
-            {"$push": {"completed_themes": theme}, "$set": {"updated_at": datetime.utcnow()}}
-        )
-    updated_user = await db.users.find_one({"id": user_id})
-    return User(**updated_user)
+    return await update_user_document(db, user_id, {
+        "$addToSet": {"completed_themes": theme},
+        "$set": {"updated_at": datetime.utcnow()}
+    })
 
 @router.post("/{user_id}/progress", response_model=UserProgress)
 async def save_progress(user_id: str, progress: UserProgress, db: AsyncIOMotorClient = Depends(get_database)):
@@ -102,6 +129,11 @@ async def save_progress(user_id: str, progress: UserProgress, db: AsyncIOMotorCl
     return progress
 
 @router.get("/{user_id}/progress", response_model=List[UserProgress])
-async def get_user_progress(user_id: str, db: AsyncIOMotorClient = Depends(get_database)):
-    progress_list = await db.user_progress.find({"user_id": user_id}).to_list(100)
-    return [UserProgress(**progress) for progress in progress_list]
+async def get_user_progress(
+    user_id: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    db: AsyncIOMotorClient = Depends(get_database)
+):
+    progress_list, next_cursor = await fetch_page(db.user_progress, {"user_id": user_id}, "timestamp", cursor, limit)
+    return validated_json_response(progress_list_adapter, progress_list, page_headers(next_cursor))
@@ -1,5 +1,6 @@
 from fastapi import FastAPI, APIRouter, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from dotenv import load_dotenv
 from contextlib import asynccontextmanager
 from motor.motor_asyncio import AsyncIOMotorClient
@@ -8,16 +9,10 @@ from pydantic import BaseModel, Field
 from typing import List
 from datetime import datetime
 import logging
-import os
 import uuid
 import asyncio
 
 asyncio.set_event_loop_policy(asyncio.DefaultEventLoopPolicy())
-<<<<<<< HEAD
-
-
-=======
->>>>>>> c4155eb80ab09b6ff32703a38c53814e7aec5001
 
 # Import routes
 from routes.users import router as users_router
@@ -25,39 +20,54 @@ from routes.quiz import router as quiz_router
 from routes.activities import router as activities_router
 from routes.budget import router as budget_router
 from routes.config import router as config_router
-from database import get_database, init_database
+from database import get_database, init_database, connect_database, close_database
+from settings import ENV
 from routes.auth import router as auth_router
+from routes.internal import router as internal_router
+from utils.auth import password_hasher
+from utils.live_quiz import live_quiz_registry
+from utils.compression import CompressionMiddleware
+from utils.metrics import MetricsMiddleware
+from utils.profiler import ProfilerMiddleware
+from utils.structured_logging import configure_logging, RequestIdMiddleware, REQUEST_ID_HEADER
+from utils.question_bank import question_bank
+from utils.write_behind import quiz_answers_buffer
+from utils.ws_hub import hub
 
 
 # Load environment variables
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+# Logs JSON écrits par un thread dédié (QueueListener) : jamais bloquants
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Lifespan context for startup/shutdown events
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    db = await connect_database()
     await init_database()
+    await question_bank.load(db)
+    quiz_answers_buffer.start()
+    hub.start()
+    live_quiz_registry.start()
     logger.info("✅ Database initialized")
     yield
-    db = await get_database()
-    db.client.close()
+    await hub.shutdown()
+    await live_quiz_registry.stop()
+    await quiz_answers_buffer.stop()
+    password_hasher.shutdown()
+    await close_database()
     logger.info("🛑 Database connection closed")
 
-# Détection de l'environnement
-ENV = os.getenv("ENV", "development")
-
 # Création de l'app avec ou sans docs selon l'env
 app = FastAPI(
     title="EHPAD Academy API",
     version="1.0.0",
     lifespan=lifespan,
+    # orjson : plus rapide que json de la stdlib, datetimes gérés nativement
+    default_response_class=ORJSONResponse,
     docs_url=None if ENV == "production" else "/docs",
     redoc_url=None if ENV == "production" else "/redoc",
     openapi_url=None if ENV == "production" else "/openapi.json",
@@ -71,15 +81,21 @@ app.add_middleware(
     allow_origins=["http://localhost:3000","https://frontehpad.vercel.app"],
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", REQUEST_ID_HEADER],
 )
-
-# --- Ajout du WebSocket endpoint ici ---
+# Ajoutés en dernier : enveloppent toute la pile, CORS compris.
+# ProfilerMiddleware s'exécute sous MetricsMiddleware, qui mesure les
+# tailles après compression.
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(ProfilerMiddleware)
+app.add_middleware(MetricsMiddleware)
+app.add_middleware(RequestIdMiddleware)
+
+# --- WebSocket : salles (classe de quiz, tableau de bord...) ---
+# Messages JSON : {"action": "join" | "leave" | "publish" | "pong", "room": ..., "data": ...}
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
-    await websocket.accept()
-    while True:
-        data = await websocket.receive_text()
-        await websocket.send_text(f"Message received: {data}")
+    await hub.serve(websocket)
 
 # Router with /api prefix
 api_router = APIRouter(prefix="/api")
@@ -118,6 +134,7 @@ api_router.include_router(activities_router)
 api_router.include_router(budget_router)
 api_router.include_router(config_router)
 api_router.include_router(auth_router, prefix="/auth")
+api_router.include_router(internal_router)
 
 
 # Register router
@@ -0,0 +1,18 @@
+from dotenv import load_dotenv
+from pathlib import Path
+import hmac
+import os
+
+load_dotenv(Path(__file__).parent / '.env')
+
+# Réglages partagés par server.py, routes/internal.py et utils/profiler.py
+ENV = os.getenv("ENV", "development")
+
+# Endpoints /internal et profilage à la demande : fermés tant qu'aucun token
+# n'est configuré, quel que soit ENV
+INTERNAL_API_TOKEN = os.getenv("INTERNAL_API_TOKEN")
+
+def internal_token_valid(token) -> bool:
+    if not INTERNAL_API_TOKEN or token is None:
+        return False
+    return hmac.compare_digest(token.encode(), INTERNAL_API_TOKEN.encode())
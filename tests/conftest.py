@@ -0,0 +1,50 @@
+import os
+import sys
+
+import pytest
+from mongomock_motor import AsyncMongoMockClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+# database.py lit ces variables à l'import ; les tests tournent sur mongomock
+os.environ.setdefault("MONGO_URL", "mongodb://localhost:27017")
+os.environ.setdefault("DB_NAME", "ehpad_test")
+
+
+@pytest.fixture
+def db():
+    return AsyncMongoMockClient()["ehpad_test"]
+
+
+class CountingCollection:
+    def __init__(self, collection, calls: list):
+        self._collection = collection
+        self._calls = calls
+
+    def __getattr__(self, name):
+        attr = getattr(self._collection, name)
+        if not callable(attr):
+            return attr
+
+        def counted(*args, **kwargs):
+            self._calls.append((self._collection.name, name))
+            return attr(*args, **kwargs)
+        return counted
+
+
+class CountingDatabase:
+    """Compte les opérations envoyées à Mongo, collection par collection."""
+
+    def __init__(self, db):
+        self._db = db
+        self.calls = []
+
+    def __getattr__(self, name):
+        return CountingCollection(self._db[name], self.calls)
+
+    __getitem__ = __getattr__
+
+
+@pytest.fixture
+def counting_db(db):
+    return CountingDatabase(db)
@@ -0,0 +1,46 @@
+import numpy as np
+
+from models.budget import BudgetSimulationRequest, ExpenseUncertainty
+from routes.budget import run_simulation
+from utils.budget_engine import simulate_spending, summarize_simulation
+
+AMOUNTS = np.array([1200.0, 800.0, 300.0])
+SCENARIO = {
+    "id": "scen_test",
+    "budget": 2400.0,
+    "expenses": [
+        {"category": "Animation", "amount": 1200.0},
+        {"category": "Sorties", "amount": 800.0},
+        {"category": "Matériel", "amount": 300.0},
+    ],
+}
+PARAMS = BudgetSimulationRequest(
+    default_uncertainty=ExpenseUncertainty(inflation_min=-0.02, inflation_max=0.08, attendance_sd=0.1),
+    draws=5_000,
+)
+
+
+def simulate(seed: int) -> dict:
+    spending = simulate_spending(
+        AMOUNTS,
+        np.full(3, -0.02),
+        np.full(3, 0.08),
+        np.full(3, 0.1),
+        5_000,
+        np.random.default_rng(seed)
+    )
+    return summarize_simulation(2400.0, spending, [5, 50, 95])
+
+
+def test_same_seed_gives_identical_summary():
+    assert simulate(42) == simulate(42)
+
+
+def test_different_seed_changes_summary():
+    assert simulate(42) != simulate(43)
+
+
+def test_run_simulation_is_reproducible():
+    first = run_simulation(SCENARIO, PARAMS, seed=7)
+    assert first == run_simulation(SCENARIO, PARAMS, seed=7)
+    assert first.expected_total != run_simulation(SCENARIO, PARAMS, seed=8).expected_total
@@ -0,0 +1,39 @@
+import asyncio
+from datetime import datetime
+
+import pytest
+
+import database
+import migrations
+
+
+async def seed_dated_activity(db):
+    # mongomock ne connaît pas $toDate : la migration 3 n'a rien à dater
+    await db.activities.insert_one({"id": "seeded", "title": "Seeded", "created_at": datetime(2024, 1, 1)})
+
+
+def test_warm_start_issues_at_most_one_query(db, counting_db, monkeypatch):
+    counting = counting_db
+    monkeypatch.setattr(database, "db", counting)
+    asyncio.run(seed_dated_activity(db))
+
+    asyncio.run(database.init_database())
+    assert asyncio.run(migrations.get_schema_version(db)) == migrations.MIGRATIONS[-1][0]
+
+    assert counting.calls
+    counting.calls.clear()
+    asyncio.run(database.init_database())
+    assert len(counting.calls) <= 1, counting.calls
+
+
+def test_lost_lock_does_not_record_version(db, monkeypatch):
+    asyncio.run(seed_dated_activity(db))
+    version, _ = migrations.MIGRATIONS[-1]
+
+    async def stolen(db):
+        await db.schema_meta.update_one({"_id": migrations.LOCK_DOC_ID}, {"$set": {"owner": "other-worker"}})
+
+    monkeypatch.setattr(migrations, "MIGRATIONS", migrations.MIGRATIONS[:-1] + [(version, stolen)])
+    with pytest.raises(RuntimeError, match="lock lost"):
+        asyncio.run(migrations.run_migrations(db))
+    assert asyncio.run(migrations.get_schema_version(db)) == version - 1
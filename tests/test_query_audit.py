@@ -0,0 +1,29 @@
+"""Garde-fou COLLSCAN : le banc de charge tourne avec --audit contre un vrai
+mongod (explain() n'existe pas sur mongomock). Lancé seulement si
+AUDIT_MONGO_URL est défini, par exemple en CI avec un service mongo:7 :
+
+    AUDIT_MONGO_URL=mongodb://localhost:27017 python -m pytest tests/test_query_audit.py
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AUDIT_MONGO_URL = os.getenv("AUDIT_MONGO_URL")
+
+
+@pytest.mark.skipif(not AUDIT_MONGO_URL, reason="AUDIT_MONGO_URL non défini (mongod requis)")
+def test_no_collscan_on_benchmark_mix():
+    result = subprocess.run(
+        [
+            sys.executable, os.path.join(ROOT_DIR, "benchmarks", "harness.py"),
+            "--audit", "--mongo-url", AUDIT_MONGO_URL, "--db-name", "ehpad_audit",
+            "--users", "4", "--warmup", "1", "--duration", "5",
+        ],
+        capture_output=True,
+        text=True,
+        timeout=300,
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
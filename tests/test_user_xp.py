@@ -0,0 +1,23 @@
+"""mongomock exécute les appels l'un après l'autre : ce test ne reproduit pas
+une vraie concurrence. Il vérifie ce qui la rend sûre, à savoir que add_xp
+est une seule mise à jour pipeline, sans lecture préalable côté Python.
+La charge réelle (1 000 appels /xp en parallèle contre un mongod) reste
+benchmarks/xp_concurrency.py."""
+import asyncio
+
+from routes.users import XP_PER_LEVEL, add_xp
+
+
+def test_add_xp_is_a_single_atomic_update(db, counting_db):
+    increments = [7, 13, 25, 40, 55] * 40
+
+    async def scenario():
+        await db.users.insert_one({"id": "u1", "name": "Aide-soignante", "email": "a@ehpad.fr", "xp": 0, "level": 1})
+        await asyncio.gather(*(add_xp("u1", points, counting_db) for points in increments))
+        return await db.users.find_one({"id": "u1"})
+
+    user = asyncio.run(scenario())
+    assert counting_db.calls == [("users", "find_one_and_update")] * len(increments)
+    assert user["xp"] == sum(increments)
+    # Niveau recalculé par LEVEL_FROM_XP dans le même pipeline
+    assert user["level"] == user["xp"] // XP_PER_LEVEL + 1
@@ -0,0 +1,22 @@
+import asyncio
+
+from utils.write_behind import WriteBehindBuffer
+
+
+def test_retry_after_partial_insert_ignores_duplicates(db, monkeypatch):
+    buffer = WriteBehindBuffer("quiz_answers", batch_size=100, flush_interval=60, max_pending=100)
+
+    async def get_database():
+        return db
+
+    async def scenario():
+        # Premier essai déjà partiellement écrit : les _id sont ceux assignés par pymongo
+        await db.quiz_answers.insert_many([{"_id": 1, "n": 1}, {"_id": 2, "n": 2}])
+        buffer._pending = [{"_id": 1, "n": 1}, {"_id": 2, "n": 2}, {"_id": 3, "n": 3}]
+        await buffer.flush()
+        return await db.quiz_answers.count_documents({})
+
+    monkeypatch.setattr("utils.write_behind.get_database", get_database)
+    assert asyncio.run(scenario()) == 3
+    assert buffer._pending == []
+    assert buffer.failures == 0
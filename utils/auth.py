@@ -1,15 +1,37 @@
+from fastapi import HTTPException, Depends
+from fastapi.security import OAuth2PasswordBearer
 from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
+from bson import ObjectId
+from bson.errors import InvalidId
+import asyncio
+import copy
 import os
+import time
 from dotenv import load_dotenv
 
+from database import get_database
+from models.user import USER_PRIVATE_PROJECTION
+from utils.cache import TTLCache
+
 load_dotenv()
 
 SECRET_KEY = os.getenv("JWT_SECRET_KEY", "supersecret")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24  # 1 jour
 
+# bcrypt est volontairement lent : on le sort de la boucle asyncio
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+PASSWORD_HASH_QUEUE_LIMIT = int(os.getenv("PASSWORD_HASH_QUEUE_LIMIT", "64"))
+
+# Cache des utilisateurs authentifiés, indexé par token
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+
+oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
 def get_password_hash(password: str) -> str:
@@ -18,8 +40,156 @@ def get_password_hash(password: str) -> str:
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
 
+
+class PasswordHasherBusy(Exception):
+    pass
+
+
+class PasswordHasher:
+    def __init__(self, workers: int, queue_limit: int):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self._executor = None
+        self._pending = 0
+        self._peak_pending = 0
+        self._completed = 0
+        self._rejected = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._total_run = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    async def _run(self, fn, *args):
+        if self._pending >= self.workers + self.queue_limit:
+            self._rejected += 1
+            raise PasswordHasherBusy()
+
+        self._pending += 1
+        self._peak_pending = max(self._peak_pending, self._pending)
+        submitted = time.perf_counter()
+
+        def job():
+            started = time.perf_counter()
+            return started, fn(*args)
+
+        try:
+            loop = asyncio.get_running_loop()
+            started, result = await loop.run_in_executor(self._get_executor(), job)
+        finally:
+            self._pending -= 1
+
+        wait = started - submitted
+        self._completed += 1
+        self._total_wait += wait
+        self._max_wait = max(self._max_wait, wait)
+        self._total_run += time.perf_counter() - started
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    def stats(self) -> dict:
+        completed = self._completed or 1
+        return {
+            "workers": self.workers,
+            "queue_limit": self.queue_limit,
+            "in_flight": min(self._pending, self.workers),
+            "queued": max(0, self._pending - self.workers),
+            "peak_pending": self._peak_pending,
+            "saturation": self._pending / (self.workers + self.queue_limit),
+            "completed": self._completed,
+            "rejected": self._rejected,
+            "avg_wait_ms": self._total_wait / completed * 1000,
+            "max_wait_ms": self._max_wait * 1000,
+            "avg_run_ms": self._total_run / completed * 1000,
+        }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+password_hasher = PasswordHasher(PASSWORD_HASH_WORKERS, PASSWORD_HASH_QUEUE_LIMIT)
+
 def create_access_token(data: dict, expires_delta: timedelta = None) -> str:
     to_encode = data.copy()
     expire = datetime.utcnow() + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES))
     to_encode.update({"exp": expire})
     return jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
+
+def decode_access_token(token: str) -> dict:
+    return jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+
+
+class PrincipalCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.ttl = ttl
+        self._cache = TTLCache(maxsize, on_evict=self._forget)
+        self._tokens_by_user = {}
+
+    def get(self, token: str):
+        entry = self._cache.get(token)
+        return entry[0] if entry is not None else None
+
+    def set(self, token: str, principal: dict, user_keys, exp: float):
+        # Jamais au-delà de l'expiration du token
+        ttl = min(self.ttl, exp - time.time())
+        if ttl <= 0:
+            return
+        user_keys = [key for key in user_keys if key]
+        self._cache.set(token, (principal, user_keys), ttl)
+        for key in user_keys:
+            self._tokens_by_user.setdefault(key, set()).add(token)
+
+    def invalidate_user(self, user_id: str):
+        for token in self._tokens_by_user.pop(user_id, set()):
+            entry = self._cache.pop(token)
+            if entry is not None:
+                self._forget(token, entry)
+
+    def _forget(self, token, entry):
+        for key in entry[1]:
+            tokens = self._tokens_by_user.get(key)
+            if tokens is not None:
+                tokens.discard(token)
+                if not tokens:
+                    del self._tokens_by_user[key]
+
+    def stats(self) -> dict:
+        return {**self._cache.stats(), "ttl": self.ttl, "users": len(self._tokens_by_user)}
+
+
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
+
+async def get_current_user(access_token: str = Depends(oauth2_scheme)) -> dict:
+    # Copie : un appelant qui modifie le dict ne doit pas altérer le cache
+    principal = principal_cache.get(access_token)
+    if principal is not None:
+        return copy.deepcopy(principal)
+
+    try:
+        payload = decode_access_token(access_token)
+        user_id = payload.get("sub")
+        if user_id is None:
+            raise HTTPException(status_code=401, detail="Token invalide")
+        object_id = ObjectId(user_id)
+    except (JWTError, InvalidId):
+        raise HTTPException(status_code=401, detail="Token invalide")
+
+    db = await get_database()
+    user = await db.users.find_one({"_id": object_id}, USER_PRIVATE_PROJECTION)
+    if not user:
+        raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
+
+    user_keys = [user_id, user.get("id")]
+    user["id"] = str(user.pop("_id"))
+    principal_cache.set(access_token, user, user_keys, payload["exp"])
+    return copy.deepcopy(user)
@@ -0,0 +1,36 @@
+from fastapi import HTTPException
+from pydantic import BaseModel, TypeAdapter
+from functools import lru_cache
+from typing import Generic, List, Optional, Tuple, TypeVar
+
+from utils.projection import partial_model
+
+BATCH_MAX_IDS = 100
+
+T = TypeVar("T")
+
+
+class Batch(BaseModel, Generic[T]):
+    items: List[T]
+    missing: List[str] = []
+
+
+def parse_ids(ids: str) -> List[str]:
+    """?ids=a,b,c -> ids uniques, dans l'ordre demandé."""
+    requested = list(dict.fromkeys(value.strip() for value in ids.split(",") if value.strip()))
+    if not requested:
+        raise HTTPException(status_code=400, detail="No ids given")
+    if len(requested) > BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {BATCH_MAX_IDS} ids per request")
+    return requested
+
+
+def in_request_order(documents, ids: List[str], key: str = "id") -> Tuple[list, List[str]]:
+    by_id = {document[key]: document for document in documents}
+    return [by_id[value] for value in ids if value in by_id], [value for value in ids if value not in by_id]
+
+
+@lru_cache(maxsize=256)
+def batch_adapter(model, selected: Optional[Tuple[str, ...]] = None) -> TypeAdapter:
+    item = model if selected is None else partial_model(model, selected)
+    return TypeAdapter(Batch[item])
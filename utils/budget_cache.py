@@ -0,0 +1,51 @@
+import os
+
+from utils.cache import TTLCache
+
+SCENARIO_CACHE_SIZE = int(os.getenv("SCENARIO_CACHE_SIZE", "256"))
+SESSION_SCENARIO_CACHE_SIZE = int(os.getenv("SESSION_SCENARIO_CACHE_SIZE", "10000"))
+SIMULATION_CACHE_SIZE = int(os.getenv("SIMULATION_CACHE_SIZE", "512"))
+
+
+class BudgetCache:
+    """Scénarios budgétaires (immuables une fois créés) et session -> scénario."""
+
+    def __init__(self, maxsize: int, session_maxsize: int, simulation_maxsize: int):
+        self._scenarios = TTLCache(maxsize)
+        self._session_scenarios = TTLCache(session_maxsize)
+        # Résultats Monte Carlo par (scenario_id, hash des paramètres)
+        self.simulations = TTLCache(simulation_maxsize)
+
+    async def get(self, db, scenario_id: str):
+        scenario = self._scenarios.get(scenario_id)
+        if scenario is None:
+            scenario = await db.budget_scenarios.find_one({"id": scenario_id}, {"_id": 0})
+            if scenario is not None:
+                self._scenarios.set(scenario_id, scenario)
+        return scenario
+
+    def put(self, scenario: dict):
+        self._scenarios.set(scenario["id"], scenario)
+
+    def remember_session(self, session_id: str, scenario_id: str):
+        self._session_scenarios.set(session_id, scenario_id)
+
+    async def scenario_id_for_session(self, db, session_id: str):
+        scenario_id = self._session_scenarios.get(session_id)
+        if scenario_id is None:
+            session = await db.budget_sessions.find_one({"id": session_id}, {"_id": 0, "scenario_id": 1})
+            if session is None:
+                return None
+            scenario_id = session["scenario_id"]
+            self._session_scenarios.set(session_id, scenario_id)
+        return scenario_id
+
+    def stats(self) -> dict:
+        return {
+            "scenarios": self._scenarios.stats(),
+            "sessions": self._session_scenarios.stats(),
+            "simulations": self.simulations.stats(),
+        }
+
+
+budget_cache = BudgetCache(SCENARIO_CACHE_SIZE, SESSION_SCENARIO_CACHE_SIZE, SIMULATION_CACHE_SIZE)
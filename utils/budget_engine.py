@@ -0,0 +1,55 @@
+import numpy as np
+
+
+def expense_matrix(variants, category_count: int) -> np.ndarray:
+    matrix = np.asarray(variants, dtype=np.float64)
+    if matrix.ndim != 2 or matrix.shape[1] != category_count:
+        raise ValueError(f"each variant must contain {category_count} amounts")
+    if not np.isfinite(matrix).all() or (matrix < 0).any():
+        raise ValueError("amounts must be finite and non-negative")
+    return matrix
+
+
+def evaluate_variants(budget: float, expenses: np.ndarray, residents: int = None) -> dict:
+    """Totaux, reste, dépassement et répartition par catégorie pour N variantes.
+
+    expenses est une matrice (variantes x catégories) dans l'ordre de
+    BudgetScenario.expenses.
+    """
+    totals = expenses.sum(axis=1)
+    safe_totals = np.where(totals > 0, totals, 1.0)
+    return {
+        "total_spent": totals,
+        "remaining": budget - totals,
+        "is_over_budget": totals > budget,
+        "shares": expenses / safe_totals[:, None],
+        "per_resident": totals / residents if residents else None,
+    }
+
+
+def simulate_spending(amounts: np.ndarray, inflation_low: np.ndarray, inflation_high: np.ndarray,
+                      attendance_sd: np.ndarray, draws: int, rng: np.random.Generator) -> np.ndarray:
+    """Tirages Monte Carlo des dépenses (tirages x catégories).
+
+    Chaque dépense est multipliée par une inflation uniforme sur
+    [inflation_low, inflation_high] et par une fréquentation normale
+    centrée sur 1 (tronquée à 0).
+    """
+    shape = (draws, amounts.shape[0])
+    inflation = rng.uniform(inflation_low, inflation_high, size=shape)
+    attendance = np.maximum(rng.normal(1.0, attendance_sd, size=shape), 0.0)
+    return amounts * (1.0 + inflation) * attendance
+
+
+def summarize_simulation(budget: float, spending: np.ndarray, percentiles) -> dict:
+    totals = spending.sum(axis=1)
+    remaining = budget - totals
+    return {
+        "overspend_probability": float((totals > budget).mean()),
+        "expected_total": float(totals.mean()),
+        "expected_remaining": float(remaining.mean()),
+        "total_percentiles": np.percentile(totals, percentiles).tolist(),
+        "remaining_percentiles": np.percentile(remaining, percentiles).tolist(),
+        "category_percentiles": np.percentile(spending, percentiles, axis=0).T.tolist(),
+        "category_means": spending.mean(axis=0).tolist(),
+    }
@@ -0,0 +1,158 @@
+import os
+import zlib
+
+try:
+    import brotli
+except ImportError:  # dans requirements.txt ; repli sur gzip seul s'il manque
+    brotli = None
+
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+GZIP_LEVEL = int(os.getenv("GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("BROTLI_QUALITY", "4"))
+
+COMPRESSIBLE_TYPES = ("application/json", "text/", "application/javascript", "image/svg+xml")
+
+
+def accepted_encodings(header: str) -> dict:
+    encodings = {}
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        if name:
+            encodings[name.strip().lower()] = quality
+    return encodings
+
+
+def negotiate(header: str):
+    if not header:
+        return None
+    encodings = accepted_encodings(header)
+    candidates = (["br"] if brotli is not None else []) + ["gzip"]
+    best = max(candidates, key=lambda name: encodings.get(name, encodings.get("*", 0)))
+    return best if encodings.get(best, encodings.get("*", 0)) > 0 else None
+
+
+class Compressor:
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            # wbits 31 = en-tête et pied gzip
+            self._compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data)
+        return self._compressor.compress(data)
+
+    def finish(self) -> bytes:
+        return self._compressor.finish() if self.encoding == "br" else self._compressor.flush()
+
+
+def compressed_headers(raw_headers, encoding: str, content_length: int = None) -> list:
+    headers, vary = [], []
+    for name, value in raw_headers:
+        lowered = name.lower()
+        if lowered == b"content-length":
+            continue
+        if lowered == b"vary":
+            vary.append(value)
+            continue
+        if lowered == b"etag" and not value.startswith(b"W/"):
+            # Représentation différente : l'ETag devient faible
+            value = b"W/" + value
+        headers.append((name, value))
+    headers.append((b"vary", b", ".join(vary + [b"Accept-Encoding"])))
+    if encoding is not None:
+        headers.append((b"content-encoding", encoding.encode()))
+    if content_length is not None:
+        headers.append((b"content-length", str(content_length).encode()))
+    return headers
+
+
+class CompressionMiddleware:
+    """Compression gzip/brotli négociée via Accept-Encoding, au-delà de
+    COMPRESSION_MIN_SIZE octets. Les petites réponses, les réponses déjà
+    encodées et les types non textuels passent inchangés."""
+
+    def __init__(self, app, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept = value.decode("latin-1")
+                break
+        encoding = negotiate(accept)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        compressor = None
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start, compressor, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                if message["status"] == 304:
+                    # Même ETag (faible) que la réponse 200 compressée
+                    passthrough = True
+                    await send({**message, "headers": compressed_headers(message.get("headers", []), None)})
+                    return
+                headers = {name.lower(): value for name, value in message.get("headers", [])}
+                content_type = headers.get(b"content-type", b"").decode("latin-1")
+                if b"content-encoding" in headers or not content_type.startswith(COMPRESSIBLE_TYPES):
+                    passthrough = True
+                    await send(message)
+                    return
+                # Attend le premier bloc pour connaître la taille
+                start = message
+                return
+
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None:
+                if not more_body and len(body) < self.minimum_size:
+                    passthrough = True
+                    await send(start)
+                    await send(message)
+                    return
+                compressor = Compressor(encoding)
+                if not more_body:
+                    # Réponse en un seul bloc : compressée d'un coup, longueur connue
+                    compressed = compressor.compress(body) + compressor.finish()
+                    await send({**start, "headers": compressed_headers(start["headers"], encoding, len(compressed))})
+                    await send({"type": "http.response.body", "body": compressed})
+                    return
+                await send({**start, "headers": compressed_headers(start["headers"], encoding)})
+
+            chunk = compressor.compress(body)
+            if not more_body:
+                chunk += compressor.finish()
+            if chunk or not more_body:
+                await send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
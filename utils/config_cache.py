@@ -0,0 +1,104 @@
+from pydantic import TypeAdapter
+from pymongo.errors import DuplicateKeyError
+from typing import List
+import asyncio
+import os
+import time
+
+from models.config import GameConfig, Avatar, Badge
+from utils.http import etag_for
+
+GAME_CONFIG_REFRESH_INTERVAL = float(os.getenv("GAME_CONFIG_REFRESH_INTERVAL", "30"))
+
+DEFAULT_GAME_CONFIG = {
+    "type": "main",
+    "avatars": [
+        {"id": "avatar1", "name": "Animateur Débutant", "image": "👨‍🏫", "unlocked": True, "required_level": 1},
+        {"id": "avatar2", "name": "Animatrice Experte", "image": "👩‍🏫", "unlocked": False, "required_level": 5},
+        {"id": "avatar3", "name": "Coordinateur", "image": "👨‍💼", "unlocked": False, "required_level": 10},
+        {"id": "avatar4", "name": "Directrice", "image": "👩‍💼", "unlocked": False, "required_level": 15}
+    ],
+    "badges": [
+        {"id": "first_quiz", "name": "Premier Quiz", "description": "Complété votre premier quiz", "icon": "🎯", "condition": "Complete first quiz"},
+        {"id": "legislation_master", "name": "Maître de la Législation", "description": "Excellé en législation", "icon": "⚖️", "condition": "Score 80%+ in legislation"},
+        {"id": "animation_expert", "name": "Expert Animation", "description": "Maîtrise des techniques d'animation", "icon": "🎭", "condition": "Score 80%+ in animation"},
+        {"id": "budget_wizard", "name": "Magicien du Budget", "description": "Parfait en gestion budgétaire", "icon": "💰", "condition": "Score 80%+ in budget"},
+        {"id": "creator", "name": "Créateur", "description": "Créé votre première fiche d'activité", "icon": "✨", "condition": "Create first activity"}
+    ],
+    "themes": [
+        {"id": "legislation", "name": "Législation", "description": "Règles et lois régissant les EHPAD", "icon": "⚖️", "color": "bg-blue-500", "order": 0},
+        {"id": "animation_types", "name": "Types d'Animation", "description": "Différentes formes d'animation en EHPAD", "icon": "🎭", "color": "bg-green-500", "order": 1},
+        {"id": "project_management", "name": "Gestion de Projet", "description": "Planification et organisation d'activités", "icon": "📋", "color": "bg-purple-500", "order": 2},
+        {"id": "budget_management", "name": "Gestion de Budget", "description": "Maîtrise des aspects financiers", "icon": "💰", "color": "bg-orange-500", "order": 3}
+    ],
+    "xp_per_correct_answer": 20,
+    "xp_per_activity_creation": 50,
+    "xp_per_budget_simulation": 30,
+    "xp_per_level": 100
+}
+
+avatars_adapter = TypeAdapter(List[Avatar])
+badges_adapter = TypeAdapter(List[Badge])
+themes_adapter = TypeAdapter(List[dict])
+
+
+class GameConfigSnapshot:
+    """Configuration figée et ses réponses JSON pré-sérialisées (corps, ETag)."""
+
+    def __init__(self, config: GameConfig, version: int):
+        self.config = config
+        self.version = version
+        self.responses = {}
+        for name, body in (
+            ("game", config.model_dump_json().encode()),
+            ("avatars", avatars_adapter.dump_json(config.avatars)),
+            ("badges", badges_adapter.dump_json(config.badges)),
+            ("themes", themes_adapter.dump_json(config.themes)),
+        ):
+            self.responses[name] = (body, etag_for(body))
+
+
+class GameConfigCache:
+    """Un seul chargement par worker ; le champ version est relu au plus
+    toutes les refresh_interval secondes pour que les workers convergent.
+    Toute écriture dans game_config doit incrémenter version."""
+
+    def __init__(self, refresh_interval: float):
+        self.refresh_interval = refresh_interval
+        self._snapshot = None
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    def _fresh(self) -> bool:
+        return self._snapshot is not None and time.monotonic() - self._checked_at < self.refresh_interval
+
+    async def _ensure_default(self, db):
+        try:
+            await db.game_config.update_one(
+                {"type": "main"},
+                {"$setOnInsert": {**DEFAULT_GAME_CONFIG, "version": 1}},
+                upsert=True
+            )
+        except DuplicateKeyError:
+            # Inséré en parallèle par un autre worker
+            pass
+
+    async def snapshot(self, db) -> GameConfigSnapshot:
+        if self._fresh():
+            return self._snapshot
+        async with self._lock:
+            if self._fresh():
+                return self._snapshot
+            meta = await db.game_config.find_one({"type": "main"}, {"_id": 0, "version": 1})
+            if meta is None:
+                await self._ensure_default(db)
+                meta = {"version": None}
+            version = meta.get("version", 0)
+            if self._snapshot is None or version is None or version != self._snapshot.version:
+                config = await db.game_config.find_one({"type": "main"}, {"_id": 0})
+                self._snapshot = GameConfigSnapshot(GameConfig(**config), config.get("version", 0))
+            self._checked_at = time.monotonic()
+            return self._snapshot
+
+
+game_config_cache = GameConfigCache(GAME_CONFIG_REFRESH_INTERVAL)
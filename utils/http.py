@@ -0,0 +1,41 @@
+from fastapi import Request, Response
+from pydantic import TypeAdapter
+import hashlib
+
+from utils.profiler import profile_section
+
+
+def etag_for(body: bytes) -> str:
+    return '"%s"' % hashlib.sha1(body).hexdigest()
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [value.strip() for value in if_none_match.split(",")]
+    return etag in candidates or f"W/{etag}" in candidates
+
+
+def json_bytes_response(request: Request, body: bytes, etag: str = None, cache_control: str = None,
+                        headers: dict = None, media_type: str = "application/json") -> Response:
+    """Réponse JSON déjà sérialisée, avec ETag et 304 si le client est à jour."""
+    headers = dict(headers or {})
+    if cache_control:
+        headers["Cache-Control"] = cache_control
+    if etag:
+        headers["ETag"] = etag
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+def validated_json_response(adapter: TypeAdapter, data, headers: dict = None) -> Response:
+    """Valide une seule fois les documents Mongo et sérialise directement en
+    bytes ; la Response court-circuite la re-validation du response_model."""
+    with profile_section("validation"):
+        validated = adapter.validate_python(data)
+    with profile_section("serialization"):
+        body = adapter.dump_json(validated)
+    return Response(content=body, media_type="application/json", headers=headers)
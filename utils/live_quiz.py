@@ -0,0 +1,260 @@
+from pymongo import UpdateOne
+from pymongo.errors import PyMongoError
+from datetime import datetime, timedelta
+from uuid import uuid4
+import asyncio
+import logging
+import os
+import socket
+
+from database import get_database
+from utils.question_bank import question_bank
+
+logger = logging.getLogger(__name__)
+
+LIVE_QUIZ_FLUSH_INTERVAL = float(os.getenv("LIVE_QUIZ_FLUSH_INTERVAL", "2"))
+# Durée d'un claim live, renouvelé à chaque flush : doit rester bien au-dessus de l'intervalle
+LIVE_QUIZ_CLAIM_TTL = float(os.getenv("LIVE_QUIZ_CLAIM_TTL", "30"))
+
+# Identifie ce worker comme propriétaire des sessions qu'il joue
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}:{uuid4().hex[:8]}"
+
+CLAIM_FIELDS = {"live": "", "live_owner": "", "live_expires_at": ""}
+
+# Champs de QuizSession modifiés pendant une partie
+PROGRESS_FIELDS = ("current_question", "score", "answers", "completed", "completed_at")
+
+
+def unclaimed(now: datetime = None) -> dict:
+    """Filtre : session sans claim live, ou claim expiré (worker disparu)."""
+    return {"live_expires_at": {"$not": {"$gt": now or datetime.utcnow()}}}
+
+
+def claim_fields(now: datetime = None) -> dict:
+    now = now or datetime.utcnow()
+    return {"live": True, "live_owner": WORKER_ID, "live_expires_at": now + timedelta(seconds=LIVE_QUIZ_CLAIM_TTL)}
+
+
+class LiveQuizError(Exception):
+    def __init__(self, status_code: int, detail: str):
+        self.status_code = status_code
+        self.detail = detail
+
+
+class LiveQuizSession:
+    def __init__(self, session: dict, questions: dict):
+        self.session = session
+        self.questions = questions
+        self.connections = 0
+        self.dirty = False
+
+    def current(self):
+        session = self.session
+        if session["completed"]:
+            return None
+        return self.questions[session["questions"][session["current_question"]]]
+
+    def answer(self, question_id: str, user_answer: int) -> dict:
+        # Aucun await : deux sockets sur la même session ne peuvent pas s'entrelacer
+        session = self.session
+        if session["completed"]:
+            raise LiveQuizError(400, "Quiz already completed")
+        question = self.current()
+        if question["id"] != question_id:
+            raise LiveQuizError(409, "Question already answered or not the current question")
+
+        is_correct = user_answer == question["correct_answer"]
+        session["score"] += 1 if is_correct else 0
+        session["current_question"] += 1
+        session["answers"].append(user_answer)
+        if session["current_question"] >= len(session["questions"]):
+            session["completed"] = True
+            session["completed_at"] = datetime.utcnow()
+        self.dirty = True
+        return {
+            "is_correct": is_correct,
+            "correct_answer": question["correct_answer"],
+            "explanation": question["explanation"],
+            "score": session["score"],
+            "completed": session["completed"]
+        }
+
+    def progress(self) -> dict:
+        return {field: self.session[field] for field in PROGRESS_FIELDS}
+
+
+class LiveQuizRegistry:
+    """Sessions de quiz jouées en WebSocket, tenues en mémoire.
+
+    La progression est écrite dans quiz_sessions toutes les flush_interval
+    secondes (un seul bulk_write), ainsi qu'à la déconnexion et à la fin du
+    quiz. Tant qu'une session est live, le document porte live=True et les
+    réponses REST sont refusées, y compris sur les autres workers.
+
+    Le claim (live_owner, live_expires_at) est renouvelé à chaque flush ; un
+    autre worker ne peut pas le prendre tant qu'il n'a pas expiré, et seul
+    le propriétaire le libère.
+    """
+
+    def __init__(self, flush_interval: float, owner: str = WORKER_ID):
+        self.flush_interval = flush_interval
+        self.owner = owner
+        self.sessions = {}
+        self._locks = {}
+        self._task = None
+        self.answers = 0
+        self.checkpoints = 0
+        self.failures = 0
+        self.lost_claims = 0
+
+    def _claim(self) -> dict:
+        return {**claim_fields(), "live_owner": self.owner}
+
+    def _owned(self, session_id: str) -> dict:
+        return {"id": session_id, "live_owner": self.owner}
+
+    def get(self, session_id: str):
+        return self.sessions.get(session_id)
+
+    def answer(self, live: LiveQuizSession, question_id: str, user_answer: int) -> dict:
+        result = live.answer(question_id, user_answer)
+        self.answers += 1
+        return result
+
+    async def attach(self, db, session_id: str) -> LiveQuizSession:
+        lock = self._locks.setdefault(session_id, asyncio.Lock())
+        async with lock:
+            live = self.sessions.get(session_id)
+            if live is None:
+                session = await db.quiz_sessions.find_one_and_update(
+                    {"id": session_id, "$or": [{"live_owner": self.owner}, unclaimed()]},
+                    {"$set": self._claim()},
+                    projection={"_id": 0, **{field: 0 for field in CLAIM_FIELDS}}
+                )
+                if not session:
+                    self._locks.pop(session_id, None)
+                    if await db.quiz_sessions.find_one({"id": session_id}, {"_id": 1}):
+                        raise LiveQuizError(409, "Session is being played live on another worker")
+                    raise LiveQuizError(404, "Session not found")
+                session.setdefault("answers", [])
+                questions = {}
+                for question_id in session["questions"]:
+                    question = await question_bank.get(db, question_id)
+                    if question is None:
+                        await db.quiz_sessions.update_one(self._owned(session_id), {"$unset": CLAIM_FIELDS})
+                        self._locks.pop(session_id, None)
+                        raise LiveQuizError(404, "Question not found")
+                    questions[question_id] = question
+                live = self.sessions.setdefault(session_id, LiveQuizSession(session, questions))
+            live.connections += 1
+            return live
+
+    async def detach(self, session_id: str):
+        lock = self._locks.setdefault(session_id, asyncio.Lock())
+        async with lock:
+            live = self.sessions.get(session_id)
+            if live is None:
+                return
+            live.connections -= 1
+            if live.connections > 0:
+                return
+            await self.checkpoint(session_id, release=True)
+            if session_id not in self.sessions:
+                self._locks.pop(session_id, None)
+
+    async def checkpoint(self, session_id: str, release: bool = False):
+        live = self.sessions.get(session_id)
+        if live is None:
+            return
+        if release:
+            update = {"$set": live.progress(), "$unset": CLAIM_FIELDS}
+        else:
+            update = {"$set": {**live.progress(), **self._claim()}}
+        live.dirty = False
+        db = await get_database()
+        try:
+            result = await db.quiz_sessions.update_one(self._owned(session_id), update)
+        except PyMongoError:
+            live.dirty = True
+            self.failures += 1
+            logger.exception("Live quiz checkpoint failed for session %s", session_id)
+            return
+        if result.matched_count == 0:
+            # Claim expiré et repris ailleurs : on n'écrase pas l'autre worker
+            self.lost_claims += 1
+            logger.warning("Live quiz claim lost for session %s", session_id)
+        self.checkpoints += 1
+        if release and not live.dirty:
+            del self.sessions[session_id]
+
+    async def flush(self):
+        # Toutes les sessions tenues renouvellent leur claim, même inactives
+        sessions = [(session_id, live, live.dirty) for session_id, live in self.sessions.items()]
+        if not sessions:
+            return
+        for _, live, _ in sessions:
+            live.dirty = False
+        claim = self._claim()
+        db = await get_database()
+        try:
+            result = await db.quiz_sessions.bulk_write(
+                [
+                    UpdateOne(self._owned(session_id), {"$set": {**live.progress(), **claim} if dirty else claim})
+                    for session_id, live, dirty in sessions
+                ],
+                ordered=False
+            )
+        except PyMongoError:
+            for _, live, dirty in sessions:
+                live.dirty = live.dirty or dirty
+            self.failures += 1
+            logger.exception("Live quiz flush failed (%s sessions)", len(sessions))
+            return
+        if result.matched_count < len(sessions):
+            self.lost_claims += len(sessions) - result.matched_count
+            logger.warning("Live quiz claims lost for %s sessions", len(sessions) - result.matched_count)
+        self.checkpoints += sum(1 for _, _, dirty in sessions if dirty)
+
+    async def release_expired(self):
+        # Claims laissés par un worker tué : la REST les ignore déjà, on nettoie
+        db = await get_database()
+        try:
+            await db.quiz_sessions.update_many({"live": True, **unclaimed()}, {"$unset": CLAIM_FIELDS})
+        except PyMongoError:
+            logger.exception("Live quiz expired claims cleanup failed")
+
+    async def _run(self):
+        await self.release_expired()
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for session_id in list(self.sessions):
+            self.sessions[session_id].connections = 0
+            await self.checkpoint(session_id, release=True)
+
+    def stats(self) -> dict:
+        return {
+            "sessions": len(self.sessions),
+            "connections": sum(live.connections for live in self.sessions.values()),
+            "dirty": sum(1 for live in self.sessions.values() if live.dirty),
+            "answers": self.answers,
+            "checkpoints": self.checkpoints,
+            "failures": self.failures,
+            "lost_claims": self.lost_claims,
+        }
+
+
+live_quiz_registry = LiveQuizRegistry(LIVE_QUIZ_FLUSH_INTERVAL)
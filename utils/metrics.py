@@ -0,0 +1,180 @@
+from bisect import bisect_left
+from contextvars import ContextVar
+import threading
+import time
+
+# Bornes des histogrammes, en secondes / octets / appels
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+CALLS_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50)
+
+
+class RequestStats:
+    """Compteurs propres à une requête HTTP, partagés via une ContextVar.
+
+    Motor copie le contexte vers ses threads : les listeners pymongo
+    modifient donc bien l'objet de la requête qui a lancé la commande.
+    """
+
+    __slots__ = ("scope", "mongo_calls", "mongo_seconds", "profile")
+
+    def __init__(self, scope: dict = None):
+        self.scope = scope
+        self.mongo_calls = 0
+        self.mongo_seconds = 0.0
+        # RequestProfile quand la requête est profilée (utils/profiler.py)
+        self.profile = None
+
+
+current_request = ContextVar("current_request", default=None)
+
+
+class Histogram:
+    def __init__(self, name: str, help_text: str, label_names, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self.buckets = tuple(buckets)
+        self._series = {}
+
+    def observe(self, labels: tuple, value: float):
+        series = self._series.get(labels)
+        if series is None:
+            series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+
+    def totals(self) -> dict:
+        # {labels: (nombre d'observations, somme)}
+        return {labels: (sum(counts), total) for labels, (counts, total) in list(self._series.items())}
+
+    def render(self, lines: list):
+        lines.append(f"# HELP {self.name} {self.help_text}")
+        lines.append(f"# TYPE {self.name} histogram")
+        for labels, (counts, total) in list(self._series.items()):
+            base = format_labels(self.label_names, labels)
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {cumulative}')
+            cumulative += counts[-1]
+            lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {cumulative}')
+            lines.append(f"{self.name}_sum{{{base}}} {total}")
+            lines.append(f"{self.name}_count{{{base}}} {cumulative}")
+
+
+class Counter:
+    def __init__(self, name: str, help_text: str, label_names):
+        self.name = name
+        self.help_text = help_text
+        self.label_names = tuple(label_names)
+        self._values = {}
+
+    def inc(self, labels: tuple, value: float = 1):
+        self._values[labels] = self._values.get(labels, 0) + value
+
+    def render(self, lines: list):
+        lines.append(f"# HELP {self.name} {self.help_text}")
+        lines.append(f"# TYPE {self.name} counter")
+        for labels, value in list(self._values.items()):
+            lines.append(f"{self.name}{{{format_labels(self.label_names, labels)}}} {value}")
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_labels(names, values) -> str:
+    return ",".join(f'{name}="{escape_label(value)}"' for name, value in zip(names, values))
+
+
+class Metrics:
+    def __init__(self):
+        self.in_flight = 0
+        self.requests = Counter("http_requests_total", "HTTP requests by route and status.", ("method", "route", "status"))
+        self.latency = Histogram("http_request_duration_seconds", "HTTP request latency.", ("method", "route"), LATENCY_BUCKETS)
+        self.response_size = Histogram("http_response_size_bytes", "HTTP response body size.", ("method", "route"), SIZE_BUCKETS)
+        self.request_mongo_calls = Histogram("http_request_mongo_calls", "Mongo commands issued per HTTP request.", ("method", "route"), CALLS_BUCKETS)
+        # Alimentés depuis les threads de Motor : protégés par un verrou
+        self._mongo_lock = threading.Lock()
+        self.mongo_latency = Histogram("mongo_command_duration_seconds", "Mongo command latency.", ("collection", "command"), LATENCY_BUCKETS)
+        self.mongo_failures = Counter("mongo_command_failures_total", "Failed Mongo commands.", ("collection", "command"))
+
+    def observe_request(self, method: str, route: str, status: int, seconds: float, size: int, stats: RequestStats):
+        labels = (method, route)
+        self.requests.inc((method, route, status))
+        self.latency.observe(labels, seconds)
+        self.response_size.observe(labels, size)
+        self.request_mongo_calls.observe(labels, stats.mongo_calls)
+
+    def observe_mongo(self, collection: str, command: str, seconds: float, failed: bool = False):
+        stats = current_request.get()
+        labels = (collection, command)
+        with self._mongo_lock:
+            if stats is not None:
+                stats.mongo_calls += 1
+                stats.mongo_seconds += seconds
+                if stats.profile is not None:
+                    stats.profile.add_mongo(command, collection, seconds)
+            self.mongo_latency.observe(labels, seconds)
+            if failed:
+                self.mongo_failures.inc(labels)
+
+    def render(self) -> str:
+        lines = [
+            "# HELP http_requests_in_flight HTTP requests currently being served.",
+            "# TYPE http_requests_in_flight gauge",
+            f"http_requests_in_flight {self.in_flight}",
+        ]
+        for metric in (self.requests, self.latency, self.response_size, self.request_mongo_calls):
+            metric.render(lines)
+        with self._mongo_lock:
+            self.mongo_latency.render(lines)
+            self.mongo_failures.render(lines)
+        return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+
+
+class MetricsMiddleware:
+    """Middleware ASGI pur (pas de BaseHTTPMiddleware) : le libellé de route
+    est le gabarit résolu par FastAPI (scope["route"]), jamais l'URL brute."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+        status = 500
+        size = 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        metrics.in_flight += 1
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            metrics.in_flight -= 1
+            current_request.reset(token)
+            route = scope.get("route")
+            metrics.observe_request(
+                scope["method"],
+                route.path if route is not None else "unmatched",
+                status,
+                elapsed,
+                size,
+                stats
+            )
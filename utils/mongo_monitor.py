@@ -0,0 +1,151 @@
+from pymongo import monitoring
+import threading
+import time
+
+from utils.metrics import metrics
+
+
+class PoolMonitor(monitoring.ConnectionPoolListener):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pools = {}
+
+    def _pool(self, address):
+        key = "%s:%s" % address
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = {
+                "open": 0,
+                "checked_out": 0,
+                "peak_checked_out": 0,
+                "checkouts": 0,
+                "checkout_failures": {},
+                "wait_total_ms": 0.0,
+                "wait_max_ms": 0.0,
+                "cleared": 0,
+            }
+        return pool
+
+    def _record_wait(self, pool):
+        started = getattr(self._local, "checkout_started", None)
+        if started is None:
+            return
+        self._local.checkout_started = None
+        wait_ms = (time.perf_counter() - started) * 1000
+        pool["wait_total_ms"] += wait_ms
+        pool["wait_max_ms"] = max(pool["wait_max_ms"], wait_ms)
+
+    def pool_created(self, event):
+        with self._lock:
+            self._pool(event.address)
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self._pool(event.address)["cleared"] += 1
+
+    def pool_closed(self, event):
+        with self._lock:
+            self._pools.pop("%s:%s" % event.address, None)
+
+    def connection_created(self, event):
+        with self._lock:
+            self._pool(event.address)["open"] += 1
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool["open"] = max(0, pool["open"] - 1)
+
+    def connection_check_out_started(self, event):
+        # La sélection et l'attente se font dans le même thread
+        self._local.checkout_started = time.perf_counter()
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            self._record_wait(pool)
+            failures = pool["checkout_failures"]
+            failures[event.reason] = failures.get(event.reason, 0) + 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            self._record_wait(pool)
+            pool["checkouts"] += 1
+            pool["checked_out"] += 1
+            pool["peak_checked_out"] = max(pool["peak_checked_out"], pool["checked_out"])
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            pool = self._pool(event.address)
+            pool["checked_out"] = max(0, pool["checked_out"] - 1)
+
+    def stats(self) -> dict:
+        with self._lock:
+            result = {}
+            for address, pool in self._pools.items():
+                checkouts = pool["checkouts"] or 1
+                result[address] = {**pool, "checkout_failures": dict(pool["checkout_failures"]), "wait_avg_ms": pool["wait_total_ms"] / checkouts}
+            return result
+
+
+def command_collection(event) -> str:
+    command = event.command
+    if event.command_name == "getMore":
+        return command.get("collection", "")
+    target = command.get(event.command_name)
+    return target if isinstance(target, str) else ""
+
+
+class CommandMonitor(monitoring.CommandListener):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._commands = {}
+        # request_id -> collection, le temps que la réponse arrive
+        self._collections = {}
+
+    def _record(self, command_name, duration_micros, failed=False):
+        duration_ms = duration_micros / 1000
+        with self._lock:
+            stats = self._commands.get(command_name)
+            if stats is None:
+                stats = self._commands[command_name] = {"count": 0, "failures": 0, "total_ms": 0.0, "max_ms": 0.0}
+            stats["count"] += 1
+            stats["failures"] += int(failed)
+            stats["total_ms"] += duration_ms
+            stats["max_ms"] = max(stats["max_ms"], duration_ms)
+
+    def started(self, event):
+        collection = command_collection(event)
+        with self._lock:
+            self._collections[event.request_id] = collection
+
+    def _finished(self, event, failed=False):
+        self._record(event.command_name, event.duration_micros, failed)
+        with self._lock:
+            collection = self._collections.pop(event.request_id, "")
+        metrics.observe_mongo(collection, event.command_name, event.duration_micros / 1e6, failed)
+
+    def succeeded(self, event):
+        self._finished(event)
+
+    def failed(self, event):
+        self._finished(event, failed=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                name: {**stats, "avg_ms": stats["total_ms"] / stats["count"]}
+                for name, stats in self._commands.items()
+            }
+
+
+pool_monitor = PoolMonitor()
+command_monitor = CommandMonitor()
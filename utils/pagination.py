@@ -0,0 +1,54 @@
+from fastapi import HTTPException
+from bson import ObjectId
+from bson.errors import InvalidId
+from datetime import datetime
+import base64
+import binascii
+import json
+
+PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+# Curseur opaque : (valeur de tri, _id) du dernier document de la page.
+# Le tri (champ desc, _id desc) doit être couvert par un index composé.
+
+def encode_cursor(sort_value: datetime, object_id: ObjectId) -> str:
+    payload = json.dumps([sort_value.isoformat(), str(object_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        sort_value, object_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(sort_value), ObjectId(object_id)
+    except (binascii.Error, ValueError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+def keyset_filter(sort_field: str, cursor: str) -> dict:
+    sort_value, object_id = decode_cursor(cursor)
+    return {"$or": [
+        {sort_field: {"$lt": sort_value}},
+        {sort_field: sort_value, "_id": {"$lt": object_id}},
+    ]}
+
+async def fetch_page(collection, filter_query: dict, sort_field: str, cursor: str = None, limit: int = PAGE_SIZE, projection=None, skip: int = 0):
+    if cursor:
+        after = keyset_filter(sort_field, cursor)
+        filter_query = {"$and": [filter_query, after]} if filter_query else after
+        skip = 0
+
+    find = collection.find(filter_query, projection).sort([(sort_field, -1), ("_id", -1)])
+    if skip:
+        find = find.skip(skip)
+    documents = await find.limit(limit + 1).to_list(limit + 1)
+
+    next_cursor = None
+    if len(documents) > limit:
+        documents = documents[:limit]
+        last = documents[-1]
+        next_cursor = encode_cursor(last[sort_field], last["_id"])
+    return documents, next_cursor
+
+def page_headers(next_cursor: str):
+    return {NEXT_CURSOR_HEADER: next_cursor} if next_cursor else None
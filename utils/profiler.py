@@ -0,0 +1,227 @@
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+import asyncio
+import itertools
+import os
+import random
+import sys
+import threading
+import time
+
+from settings import internal_token_valid
+from utils.metrics import current_request
+
+PROFILE_HEADER = "x-profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_SLOW_THRESHOLD_MS = float(os.getenv("PROFILE_SLOW_THRESHOLD_MS", "200"))
+PROFILE_STACK_INTERVAL_MS = float(os.getenv("PROFILE_STACK_INTERVAL_MS", "5"))
+PROFILE_BUFFER_SIZE = int(os.getenv("PROFILE_BUFFER_SIZE", "200"))
+PROFILE_MAX_STACK_DEPTH = 40
+PROFILE_TOP_STACKS = 20
+
+_profile_ids = itertools.count(1)
+
+
+class RequestProfile:
+    def __init__(self, method: str, path: str):
+        self.id = next(_profile_ids)
+        self.method = method
+        self.path = path
+        self.started_at = datetime.utcnow()
+        self.mongo = {}
+        self.sections = {}
+        self.stacks = {}
+
+    def add_mongo(self, command: str, collection: str, seconds: float):
+        key = f"{collection}.{command}" if collection else command
+        entry = self.mongo.get(key)
+        if entry is None:
+            entry = self.mongo[key] = [0, 0.0]
+        entry[0] += 1
+        entry[1] += seconds
+
+    def add_section(self, name: str, seconds: float):
+        self.sections[name] = self.sections.get(name, 0.0) + seconds
+
+    def report(self, route: str, status: int, total: float) -> dict:
+        mongo_ms = sum(seconds for _, seconds in self.mongo.values()) * 1000
+        sections_ms = sum(self.sections.values()) * 1000
+        stacks = sorted(self.stacks.items(), key=lambda item: item[1], reverse=True)[:PROFILE_TOP_STACKS]
+        return {
+            "id": self.id,
+            "method": self.method,
+            "path": self.path,
+            "route": route,
+            "status": status,
+            "started_at": self.started_at,
+            "total_ms": total * 1000,
+            "mongo_ms": mongo_ms,
+            "mongo": {key: {"count": count, "ms": seconds * 1000} for key, (count, seconds) in self.mongo.items()},
+            "sections_ms": {name: seconds * 1000 for name, seconds in self.sections.items()},
+            # Reste : code des handlers, dépendances, sérialisation FastAPI
+            "handler_ms": max(0.0, total * 1000 - mongo_ms - sections_ms),
+            "stack_samples": sum(self.stacks.values()),
+            "stacks": [{"stack": stack, "samples": samples} for stack, samples in stacks],
+        }
+
+
+@contextmanager
+def profile_section(name: str):
+    stats = current_request.get()
+    profile = stats.profile if stats is not None else None
+    if profile is None:
+        yield
+        return
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        profile.add_section(name, time.perf_counter() - started)
+
+
+def collapse_stack(frame) -> str:
+    parts = []
+    while frame is not None and len(parts) < PROFILE_MAX_STACK_DEPTH:
+        code = frame.f_code
+        parts.append(f"{os.path.basename(code.co_filename)}:{code.co_name}:{frame.f_lineno}")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+
+class StackSampler:
+    """Échantillonne la pile du thread de la boucle asyncio tant qu'une
+    requête profilée dépasse le seuil. La boucle est partagée : les piles
+    peuvent aussi montrer d'autres requêtes servies au même moment."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._active = {}
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def watch(self, profile: RequestProfile, thread_id: int):
+        with self._lock:
+            self._active[profile.id] = (profile, thread_id)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def unwatch(self, profile: RequestProfile):
+        with self._lock:
+            self._active.pop(profile.id, None)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            with self._lock:
+                active = list(self._active.values())
+                if not active:
+                    self._wakeup.clear()
+                    continue
+            frames = sys._current_frames()
+            stacks = {}
+            with self._lock:
+                for profile, thread_id in active:
+                    if profile.id not in self._active:
+                        continue
+                    if thread_id not in stacks:
+                        frame = frames.get(thread_id)
+                        stacks[thread_id] = collapse_stack(frame) if frame is not None else None
+                    stack = stacks[thread_id]
+                    if stack:
+                        profile.stacks[stack] = profile.stacks.get(stack, 0) + 1
+            del frames
+            time.sleep(self.interval)
+
+
+class Profiler:
+    def __init__(self, sample_rate: float, slow_threshold: float, buffer_size: int, stack_interval: float):
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_threshold
+        self.profiles = deque(maxlen=buffer_size)
+        self.sampler = StackSampler(stack_interval)
+        self.profiled = 0
+
+    def wanted(self, headers) -> bool:
+        requested = internal_token = None
+        for name, value in headers:
+            if name == b"x-profile":
+                requested = value
+            elif name == b"x-internal-token":
+                internal_token = value.decode("latin-1")
+        if requested is not None and requested not in (b"0", b"false"):
+            # Même règle d'accès que les endpoints /internal
+            if internal_token_valid(internal_token):
+                return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    def record(self, report: dict):
+        self.profiles.append(report)
+        self.profiled += 1
+
+    def recent(self, limit: int, min_ms: float = 0) -> list:
+        reports = [report for report in reversed(self.profiles) if report["total_ms"] >= min_ms]
+        return reports[:limit]
+
+    def stats(self) -> dict:
+        return {
+            "sample_rate": self.sample_rate,
+            "slow_threshold_ms": self.slow_threshold * 1000,
+            "buffered": len(self.profiles),
+            "capacity": self.profiles.maxlen,
+            "profiled": self.profiled,
+        }
+
+
+profiler = Profiler(
+    PROFILE_SAMPLE_RATE,
+    PROFILE_SLOW_THRESHOLD_MS / 1000,
+    PROFILE_BUFFER_SIZE,
+    PROFILE_STACK_INTERVAL_MS / 1000
+)
+
+
+class ProfilerMiddleware:
+    """Profilage à la demande (en-tête X-Profile avec X-Internal-Token) ou
+    par échantillonnage (PROFILE_SAMPLE_RATE). Doit être placé sous
+    MetricsMiddleware, qui crée le RequestStats de la requête."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        stats = current_request.get()
+        if scope["type"] != "http" or stats is None or not profiler.wanted(scope["headers"]):
+            await self.app(scope, receive, send)
+            return
+
+        profile = stats.profile = RequestProfile(scope["method"], scope["path"])
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                message["headers"] = list(message.get("headers", [])) + [
+                    (PROFILE_ID_HEADER.lower().encode(), str(profile.id).encode())
+                ]
+            await send(message)
+
+        # Piles échantillonnées seulement au-delà du seuil
+        slow_timer = asyncio.get_running_loop().call_later(
+            profiler.slow_threshold, profiler.sampler.watch, profile, threading.get_ident()
+        )
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            total = time.perf_counter() - started
+            slow_timer.cancel()
+            profiler.sampler.unwatch(profile)
+            stats.profile = None
+            route = scope.get("route")
+            profiler.record(profile.report(route.path if route is not None else "unmatched", status, total))
@@ -0,0 +1,40 @@
+from fastapi import HTTPException
+from pydantic import BaseModel, TypeAdapter, create_model
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+
+def select_fields(model, fields: Optional[str], always=("id",)) -> Optional[Tuple[str, ...]]:
+    """Traduit ?fields=a,b en liste de champs du modèle (None = tout)."""
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(model.model_fields)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    wanted = requested | set(always)
+    return tuple(name for name in model.model_fields if name in wanted)
+
+
+def field_projection(selected: Tuple[str, ...], keep=()) -> dict:
+    # keep : champs lus mais non renvoyés (clé de tri du curseur, _id...)
+    projection = {name: 1 for name in (*selected, *keep)}
+    if "_id" not in keep:
+        projection["_id"] = 0
+    return projection
+
+
+@lru_cache(maxsize=256)
+def partial_model(model, selected: Tuple[str, ...]) -> type:
+    fields = {name: (model.model_fields[name].annotation, model.model_fields[name]) for name in selected}
+    return create_model(f"{model.__name__}Fields", __base__=BaseModel, **fields)
+
+
+@lru_cache(maxsize=256)
+def partial_adapter(model, selected: Tuple[str, ...]) -> TypeAdapter:
+    return TypeAdapter(partial_model(model, selected))
+
+
+@lru_cache(maxsize=256)
+def partial_list_adapter(model, selected: Tuple[str, ...]) -> TypeAdapter:
+    return TypeAdapter(List[partial_model(model, selected)])
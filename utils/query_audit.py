@@ -0,0 +1,132 @@
+from pymongo import monitoring
+from pymongo.errors import OperationFailure
+from contextlib import contextmanager
+from contextvars import ContextVar
+import os
+import threading
+
+from utils.metrics import current_request
+
+# Mode test uniquement : chaque forme de requête est ensuite passée à explain()
+QUERY_AUDIT = os.getenv("QUERY_AUDIT", "0") == "1"
+
+# Origine des requêtes émises hors requête HTTP ; les migrations (backfills
+# ponctuels) ne sont pas auditées
+audit_scope = ContextVar("audit_scope", default=None)
+EXEMPT_SCOPES = {"migration"}
+
+EXPLAINABLE = {"find", "count", "distinct", "findAndModify", "update", "delete", "aggregate"}
+# Champs de session / transport refusés par la commande explain
+STRIPPED_FIELDS = {"lsid", "txnNumber", "autocommit", "startTransaction", "readConcern", "writeConcern", "$db", "$clusterTime", "$readPreference"}
+
+
+def command_filter(command_name: str, command: dict):
+    if command_name in ("find", "findAndModify"):
+        return command.get("filter", command.get("query")) or {}
+    if command_name in ("count", "distinct"):
+        return command.get("query") or {}
+    if command_name == "update":
+        return (command.get("updates") or [{}])[0].get("q") or {}
+    if command_name == "delete":
+        return (command.get("deletes") or [{}])[0].get("q") or {}
+    if command_name == "aggregate":
+        pipeline = command.get("pipeline") or []
+        return pipeline[0].get("$match", {}) if pipeline else {}
+    return {}
+
+
+@contextmanager
+def audited_as(scope: str):
+    token = audit_scope.set(scope)
+    try:
+        yield
+    finally:
+        audit_scope.reset(token)
+
+
+def filter_shape(value):
+    # Les valeurs sont masquées : deux ids différents = même forme de requête
+    if isinstance(value, dict):
+        return tuple(sorted((key, filter_shape(item)) for key, item in value.items()))
+    if isinstance(value, list):
+        return tuple(filter_shape(item) for item in value[:1])
+    return "?"
+
+
+def collscan_stages(node, in_winning_plan=False) -> list:
+    found = []
+    if isinstance(node, dict):
+        if in_winning_plan and node.get("stage") == "COLLSCAN":
+            found.append(node.get("filter", {}))
+        for key, value in node.items():
+            if key == "rejectedPlans":
+                continue
+            found += collscan_stages(value, in_winning_plan or key == "winningPlan")
+    elif isinstance(node, list):
+        for item in node:
+            found += collscan_stages(item, in_winning_plan)
+    return found
+
+
+class QueryAuditor(monitoring.CommandListener):
+    """Collecte une occurrence de chaque forme de requête (collection,
+    commande, filtre, tri) et la route qui l'a émise, puis check() lance
+    explain() sur chacune et signale les COLLSCAN. Les lectures sans filtre
+    (chargements complets volontaires) sont ignorées."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queries = {}
+
+    def started(self, event):
+        if event.command_name not in EXPLAINABLE:
+            return
+        scope = audit_scope.get()
+        if scope in EXEMPT_SCOPES:
+            return
+        command = event.command
+        query_filter = command_filter(event.command_name, command)
+        if not query_filter:
+            return
+        collection = command.get(event.command_name)
+        key = (collection, event.command_name, filter_shape(query_filter), filter_shape(command.get("sort") or {}))
+        with self._lock:
+            if key in self.queries:
+                return
+        stats = current_request.get()
+        route = stats.scope.get("route") if stats is not None and stats.scope is not None else None
+        explained = {name: value for name, value in command.items() if name not in STRIPPED_FIELDS}
+        with self._lock:
+            self.queries.setdefault(key, {
+                "route": f'{stats.scope["method"]} {route.path}' if route is not None else scope or "background",
+                "collection": collection,
+                "command": event.command_name,
+                "filter": query_filter,
+                "explain": explained,
+            })
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+    async def check(self, db) -> list:
+        with self._lock:
+            queries = list(self.queries.values())
+        violations = []
+        for query in queries:
+            try:
+                plan = await db.command({"explain": query["explain"], "verbosity": "queryPlanner"})
+            except OperationFailure as error:
+                violations.append({**self._describe(query), "error": str(error)})
+                continue
+            if collscan_stages(plan):
+                violations.append(self._describe(query))
+        return violations
+
+    def _describe(self, query: dict) -> dict:
+        return {key: query[key] for key in ("route", "collection", "command", "filter")}
+
+
+query_auditor = QueryAuditor()
@@ -0,0 +1,107 @@
+from pymongo import ReturnDocument
+import asyncio
+import os
+import time
+
+QUESTION_BANK_REFRESH_INTERVAL = float(os.getenv("QUESTION_BANK_REFRESH_INTERVAL", "5"))
+VERSION_KEY = "quiz_questions"
+
+
+class QuestionBank:
+    """Questions de quiz en mémoire, indexées par thème et par id.
+
+    Chaque écriture incrémente un compteur dans db.cache_versions ; les
+    autres workers le relisent au plus toutes les refresh_interval secondes
+    et rechargent la banque quand il a changé.
+    """
+
+    def __init__(self, refresh_interval: float):
+        self.refresh_interval = refresh_interval
+        self.version = None
+        self._by_id = {}
+        self._by_theme = {}
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def _remote_version(self, db) -> int:
+        doc = await db.cache_versions.find_one({"_id": VERSION_KEY}, {"version": 1})
+        return doc["version"] if doc else 0
+
+    async def load(self, db):
+        version = await self._remote_version(db)
+        questions = await db.quiz_questions.find({}, {"_id": 0}).to_list(None)
+        by_id, by_theme = {}, {}
+        for question in questions:
+            by_id[question["id"]] = question
+            by_theme.setdefault(question["theme"], []).append(question["id"])
+        self._by_id, self._by_theme = by_id, by_theme
+        self.version = version
+        self._checked_at = time.monotonic()
+
+    async def ensure_fresh(self, db):
+        if self.version is not None and time.monotonic() - self._checked_at < self.refresh_interval:
+            return
+        async with self._lock:
+            if self.version is not None and time.monotonic() - self._checked_at < self.refresh_interval:
+                return
+            if self.version is None or await self._remote_version(db) != self.version:
+                await self.load(db)
+            else:
+                self._checked_at = time.monotonic()
+
+    async def question_ids(self, db, theme: str) -> list:
+        await self.ensure_fresh(db)
+        return self._by_theme.get(theme, [])
+
+    async def questions(self, db, theme: str) -> list:
+        return [self._by_id[question_id] for question_id in await self.question_ids(db, theme)]
+
+    async def get(self, db, question_id: str):
+        await self.ensure_fresh(db)
+        question = self._by_id.get(question_id)
+        if question is None:
+            # Créée par un autre worker depuis le dernier rafraîchissement
+            question = await db.quiz_questions.find_one({"id": question_id}, {"_id": 0})
+            if question is not None:
+                self._add(question)
+        return question
+
+    async def get_many(self, db, question_ids) -> dict:
+        await self.ensure_fresh(db)
+        found = {question_id: self._by_id[question_id] for question_id in question_ids if question_id in self._by_id}
+        unknown = [question_id for question_id in question_ids if question_id not in found]
+        if unknown:
+            # Un seul aller-retour pour les questions créées ailleurs
+            for question in await db.quiz_questions.find({"id": {"$in": unknown}}, {"_id": 0}).to_list(len(unknown)):
+                self._add(question)
+                found[question["id"]] = question
+        return found
+
+    def _add(self, question: dict):
+        if question["id"] not in self._by_id:
+            self._by_theme.setdefault(question["theme"], []).append(question["id"])
+        self._by_id[question["id"]] = question
+
+    async def add(self, db, question: dict):
+        self._add(question)
+        meta = await db.cache_versions.find_one_and_update(
+            {"_id": VERSION_KEY},
+            {"$inc": {"version": 1}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        if self.version is not None and meta["version"] == self.version + 1:
+            self.version = meta["version"]
+        else:
+            # Un autre worker a aussi écrit : rechargement au prochain accès
+            self._checked_at = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "version": self.version,
+            "questions": len(self._by_id),
+            "themes": {theme: len(ids) for theme, ids in self._by_theme.items()},
+        }
+
+
+question_bank = QuestionBank(QUESTION_BANK_REFRESH_INTERVAL)
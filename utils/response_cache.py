@@ -0,0 +1,217 @@
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import ORJSONResponse
+from datetime import datetime, timedelta
+from pymongo import ReturnDocument
+from pymongo.errors import PyMongoError
+from urllib.parse import urlencode
+import asyncio
+import functools
+import inspect
+import logging
+import os
+import time
+
+from database import get_database
+from utils.cache import TTLCache
+from utils.http import etag_for, json_bytes_response
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "2000"))
+RESPONSE_CACHE_BACKEND = os.getenv("RESPONSE_CACHE_BACKEND", "memory")  # ou "mongo" (partagé)
+RESPONSE_CACHE_TAG_REFRESH = float(os.getenv("RESPONSE_CACHE_TAG_REFRESH", "1"))
+
+# Les versions de tags vivent à côté de celle de la banque de questions
+TAG_PREFIX = "tag:"
+# En-têtes recalculés à chaque réponse servie depuis le cache
+SKIPPED_HEADERS = {"content-length", "content-type", "etag"}
+
+
+class CachedResponse:
+    __slots__ = ("body", "etag", "media_type", "headers")
+
+    def __init__(self, body: bytes, etag: str, media_type: str, headers: dict):
+        self.body = body
+        self.etag = etag
+        self.media_type = media_type
+        self.headers = headers
+
+    def to_document(self) -> dict:
+        return {"body": self.body, "etag": self.etag, "media_type": self.media_type, "headers": self.headers}
+
+
+class MemoryBackend:
+    """LRU en mémoire du worker."""
+
+    def __init__(self, maxsize: int):
+        self._cache = TTLCache(maxsize)
+
+    async def get(self, key: str):
+        return self._cache.get(key)
+
+    async def set(self, key: str, entry: CachedResponse, ttl: float):
+        self._cache.set(key, entry, ttl)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+class MongoBackend:
+    """Entrées partagées entre workers dans db.response_cache ; l'index TTL
+    sur expires_at purge les entrées périmées (voir indexes.py)."""
+
+    def __init__(self, collection_name: str = "response_cache"):
+        self.collection_name = collection_name
+        self.failures = 0
+
+    async def get(self, key: str):
+        db = await get_database()
+        try:
+            document = await db[self.collection_name].find_one({"_id": key, "expires_at": {"$gt": datetime.utcnow()}})
+        except PyMongoError:
+            self.failures += 1
+            return None
+        if document is None:
+            return None
+        return CachedResponse(bytes(document["body"]), document["etag"], document["media_type"], document["headers"])
+
+    async def set(self, key: str, entry: CachedResponse, ttl: float):
+        db = await get_database()
+        try:
+            await db[self.collection_name].replace_one(
+                {"_id": key},
+                {**entry.to_document(), "expires_at": datetime.utcnow() + timedelta(seconds=ttl)},
+                upsert=True
+            )
+        except PyMongoError:
+            self.failures += 1
+
+    def stats(self) -> dict:
+        return {"collection": self.collection_name, "failures": self.failures}
+
+
+class TagVersions:
+    """Compteurs de version par tag, dans db.cache_versions. Une écriture
+    incrémente ses tags : les clés changent, les anciennes entrées ne sont
+    plus jamais lues. Relus au plus toutes les refresh_interval secondes."""
+
+    def __init__(self, refresh_interval: float):
+        self.refresh_interval = refresh_interval
+        self._versions = {}
+        self._checked_at = 0.0
+        self._lock = asyncio.Lock()
+
+    async def current(self, db, tags) -> tuple:
+        if time.monotonic() - self._checked_at >= self.refresh_interval:
+            async with self._lock:
+                if time.monotonic() - self._checked_at >= self.refresh_interval:
+                    await self._refresh(db)
+        return tuple(self._versions.get(tag, 0) for tag in tags)
+
+    async def _refresh(self, db):
+        documents = await db.cache_versions.find({"_id": {"$regex": f"^{TAG_PREFIX}"}}, {"version": 1}).to_list(None)
+        self._versions = {document["_id"][len(TAG_PREFIX):]: document["version"] for document in documents}
+        self._checked_at = time.monotonic()
+
+    async def bump(self, db, tags):
+        for tag in tags:
+            document = await db.cache_versions.find_one_and_update(
+                {"_id": TAG_PREFIX + tag},
+                {"$inc": {"version": 1}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER
+            )
+            self._versions[tag] = document["version"]
+
+    def stats(self) -> dict:
+        return dict(self._versions)
+
+
+class ResponseCache:
+    def __init__(self, local: MemoryBackend, shared, tag_versions: TagVersions):
+        self.local = local
+        self.shared = shared
+        self.tag_versions = tag_versions
+        self.counters = {}
+        self.invalidation_failures = 0
+
+    def _count(self, name: str, outcome: str):
+        counters = self.counters.get(name)
+        if counters is None:
+            counters = self.counters[name] = {"hits": 0, "shared_hits": 0, "misses": 0}
+        counters[outcome] += 1
+
+    def cached(self, *tags: str, ttl: float):
+        """Met en cache la réponse 200 d'une route GET. Clé : chemin +
+        paramètres de requête triés + versions des tags. La route doit
+        renvoyer une Response ou des données déjà sérialisables."""
+
+        def decorate(endpoint):
+            signature = inspect.signature(endpoint)
+            has_request = "request" in signature.parameters
+            parameters = list(signature.parameters.values())
+            if not has_request:
+                parameters.append(inspect.Parameter("request", inspect.Parameter.KEYWORD_ONLY, annotation=Request))
+            name = endpoint.__name__
+
+            @functools.wraps(endpoint)
+            async def wrapper(*args, **kwargs):
+                request = kwargs["request"] if has_request else kwargs.pop("request")
+                db = await get_database()
+                versions = await self.tag_versions.current(db, tags)
+                # urlencode échappe & et = : deux requêtes distinctes ne partagent pas une clé
+                query = urlencode(sorted(request.query_params.multi_items()))
+                key = f"{request.url.path}?{query}|{','.join(map(str, versions))}"
+
+                entry = await self.local.get(key)
+                if entry is not None:
+                    self._count(name, "hits")
+                elif self.shared is not None and (entry := await self.shared.get(key)) is not None:
+                    self._count(name, "shared_hits")
+                    await self.local.set(key, entry, ttl)
+                else:
+                    self._count(name, "misses")
+                    response = await endpoint(*args, **kwargs)
+                    if not isinstance(response, Response):
+                        response = ORJSONResponse(jsonable_encoder(response))
+                    if response.status_code != 200:
+                        return response
+                    headers = {k: v for k, v in response.headers.items() if k not in SKIPPED_HEADERS}
+                    entry = CachedResponse(response.body, etag_for(response.body), response.media_type, headers)
+                    await self.local.set(key, entry, ttl)
+                    if self.shared is not None:
+                        await self.shared.set(key, entry, ttl)
+
+                return json_bytes_response(request, entry.body, entry.etag, headers=entry.headers, media_type=entry.media_type)
+
+            wrapper.__signature__ = signature.replace(parameters=parameters)
+            return wrapper
+
+        return decorate
+
+    async def invalidate(self, db, *tags: str):
+        # Au mieux : appelé après des écritures déjà validées, un échec ne
+        # doit pas les transformer en 500. Le TTL borne alors la péremption.
+        try:
+            await self.tag_versions.bump(db, tags)
+        except PyMongoError:
+            self.invalidation_failures += 1
+            logger.warning("Response cache invalidation failed for tags %s", tags, exc_info=True)
+
+    def stats(self) -> dict:
+        return {
+            "backend": "mongo" if self.shared is not None else "memory",
+            "local": self.local.stats(),
+            "shared": self.shared.stats() if self.shared is not None else None,
+            "tag_versions": self.tag_versions.stats(),
+            "routes": self.counters,
+            "invalidation_failures": self.invalidation_failures,
+        }
+
+
+response_cache = ResponseCache(
+    MemoryBackend(RESPONSE_CACHE_SIZE),
+    MongoBackend() if RESPONSE_CACHE_BACKEND == "mongo" else None,
+    TagVersions(RESPONSE_CACHE_TAG_REFRESH)
+)
@@ -0,0 +1,113 @@
+from pymongo.errors import BulkWriteError, PyMongoError
+import asyncio
+import logging
+import os
+
+from database import get_database
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+
+WRITE_BEHIND_BATCH_SIZE = int(os.getenv("WRITE_BEHIND_BATCH_SIZE", "500"))
+WRITE_BEHIND_FLUSH_INTERVAL = float(os.getenv("WRITE_BEHIND_FLUSH_INTERVAL", "1"))
+WRITE_BEHIND_MAX_PENDING = int(os.getenv("WRITE_BEHIND_MAX_PENDING", "50000"))
+
+
+class WriteBehindBuffer:
+    """Regroupe des insertions non critiques et les écrit par insert_many."""
+
+    def __init__(self, collection_name: str, batch_size: int, flush_interval: float, max_pending: int):
+        self.collection_name = collection_name
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = []
+        self._task = None
+        self._flushing = set()
+        self.flushed = 0
+        self.batches = 0
+        self.failures = 0
+        self.dropped = 0
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    def _trim(self):
+        overflow = len(self._pending) - self.max_pending
+        if overflow > 0:
+            del self._pending[:overflow]
+            self.dropped += overflow
+
+    def add(self, document: dict):
+        self._pending.append(document)
+        self._trim()
+        if len(self._pending) >= self.batch_size:
+            task = asyncio.create_task(self.flush())
+            self._flushing.add(task)
+            task.add_done_callback(self._flushing.discard)
+
+    async def flush(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        db = await get_database()
+        try:
+            await db[self.collection_name].insert_many(batch, ordered=False)
+        except BulkWriteError as error:
+            # ordered=False : le reste du lot est inséré. Une clé dupliquée
+            # signifie déjà écrit (nouvel essai après un échec réseau).
+            failed = [
+                write_error["index"] for write_error in error.details.get("writeErrors", [])
+                if write_error.get("code") != DUPLICATE_KEY
+            ]
+            self.flushed += error.details.get("nInserted", 0)
+            self.batches += 1
+            if failed:
+                logger.warning("Write-behind flush to %s: %s documents failed", self.collection_name, len(failed))
+                self.failures += 1
+                self._requeue([batch[index] for index in failed])
+            return
+        except PyMongoError:
+            logger.exception("Write-behind flush to %s failed (%s documents)", self.collection_name, len(batch))
+            self.failures += 1
+            self._requeue(batch)
+            return
+        self.flushed += len(batch)
+        self.batches += 1
+
+    def _requeue(self, documents: list):
+        # Remis en file, en écartant les plus anciens au-delà de max_pending
+        self._pending[:0] = documents
+        self._trim()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._flushing:
+            await asyncio.gather(*self._flushing, return_exceptions=True)
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "collection": self.collection_name,
+            "pending": len(self._pending),
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "failures": self.failures,
+            "dropped": self.dropped,
+        }
+
+
+quiz_answers_buffer = WriteBehindBuffer("quiz_answers", WRITE_BEHIND_BATCH_SIZE, WRITE_BEHIND_FLUSH_INTERVAL, WRITE_BEHIND_MAX_PENDING)
@@ -0,0 +1,237 @@
+from fastapi import WebSocket, WebSocketDisconnect
+import asyncio
+import itertools
+import json
+import logging
+import os
+import time
+
+logger = logging.getLogger(__name__)
+
+WS_SEND_QUEUE_SIZE = int(os.getenv("WS_SEND_QUEUE_SIZE", "256"))
+WS_SLOW_CONSUMER_POLICY = os.getenv("WS_SLOW_CONSUMER_POLICY", "disconnect")  # ou "drop"
+WS_HEARTBEAT_INTERVAL = float(os.getenv("WS_HEARTBEAT_INTERVAL", "20"))
+WS_IDLE_TIMEOUT = float(os.getenv("WS_IDLE_TIMEOUT", "60"))
+WS_MAX_ROOMS_PER_CONNECTION = 32
+WS_MAX_ROOM_NAME = 100
+
+# Codes de fermeture WebSocket
+CLOSE_GOING_AWAY = 1001
+CLOSE_POLICY_VIOLATION = 1008
+CLOSE_TRY_AGAIN_LATER = 1013
+
+_connection_ids = itertools.count(1)
+
+
+class Connection:
+    """Un client : file d'envoi bornée vidée par une tâche dédiée, pour
+    qu'un client lent ne bloque jamais une diffusion."""
+
+    def __init__(self, websocket: WebSocket, queue_size: int):
+        self.id = next(_connection_ids)
+        self.websocket = websocket
+        self.rooms = set()
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.last_seen = time.monotonic()
+        self.dropped = 0
+        self.closed = False
+        self.sender = None
+
+    def enqueue(self, text: str) -> bool:
+        try:
+            self.queue.put_nowait(text)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def send_loop(self, hub):
+        try:
+            while True:
+                text = await self.queue.get()
+                await self.websocket.send_text(text)
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Socket fermée côté client : on nettoie sans bruit
+            hub.spawn(hub.disconnect(self))
+
+
+class ConnectionHub:
+    def __init__(self, queue_size: int, slow_consumer_policy: str, heartbeat_interval: float, idle_timeout: float):
+        self.queue_size = queue_size
+        self.slow_consumer_policy = slow_consumer_policy
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self.connections = set()
+        self.rooms = {}
+        self._heartbeat = None
+        # La boucle ne garde qu'une référence faible aux tâches
+        self._tasks = set()
+        self.messages_sent = 0
+        self.messages_dropped = 0
+        self.slow_disconnects = 0
+        self.idle_disconnects = 0
+
+    def spawn(self, coro) -> asyncio.Task:
+        task = asyncio.create_task(coro)
+        self._tasks.add(task)
+        task.add_done_callback(self._task_done)
+        return task
+
+    def _task_done(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error("WebSocket hub task failed", exc_info=task.exception())
+
+    async def connect(self, websocket: WebSocket) -> Connection:
+        await websocket.accept()
+        connection = Connection(websocket, self.queue_size)
+        connection.sender = self.spawn(connection.send_loop(self))
+        self.connections.add(connection)
+        return connection
+
+    async def disconnect(self, connection: Connection, code: int = 1000):
+        if connection.closed:
+            return
+        connection.closed = True
+        self.connections.discard(connection)
+        for room in list(connection.rooms):
+            self.leave(connection, room)
+        if connection.sender is not None and connection.sender is not asyncio.current_task():
+            connection.sender.cancel()
+        try:
+            await connection.websocket.close(code=code)
+        except Exception:
+            pass
+
+    def join(self, connection: Connection, room: str) -> bool:
+        if len(connection.rooms) >= WS_MAX_ROOMS_PER_CONNECTION and room not in connection.rooms:
+            return False
+        connection.rooms.add(room)
+        self.rooms.setdefault(room, set()).add(connection)
+        return True
+
+    def leave(self, connection: Connection, room: str):
+        connection.rooms.discard(room)
+        members = self.rooms.get(room)
+        if members is not None:
+            members.discard(connection)
+            if not members:
+                del self.rooms[room]
+
+    def send(self, connection: Connection, message) -> bool:
+        text = message if isinstance(message, str) else json.dumps(message, default=str)
+        if connection.enqueue(text):
+            self.messages_sent += 1
+            return True
+        self._slow_consumer(connection)
+        return False
+
+    def broadcast(self, room: str, message) -> int:
+        members = self.rooms.get(room)
+        if not members:
+            return 0
+        # Sérialisé une seule fois pour tous les abonnés
+        text = message if isinstance(message, str) else json.dumps(message, default=str)
+        delivered = 0
+        for connection in list(members):
+            if connection.enqueue(text):
+                delivered += 1
+            else:
+                self._slow_consumer(connection)
+        self.messages_sent += delivered
+        return delivered
+
+    def _slow_consumer(self, connection: Connection):
+        self.messages_dropped += 1
+        connection.dropped += 1
+        if self.slow_consumer_policy == "disconnect" and not connection.closed:
+            self.slow_disconnects += 1
+            self.spawn(self.disconnect(connection, CLOSE_TRY_AGAIN_LATER))
+
+    async def handle(self, connection: Connection, text: str):
+        try:
+            message = json.loads(text)
+            action = message.get("action")
+            room = message.get("room")
+        except (ValueError, AttributeError):
+            self.send(connection, {"type": "error", "detail": "Invalid message"})
+            return
+
+        if action == "pong":
+            return
+        if action in ("join", "leave", "publish") and (not isinstance(room, str) or not 0 < len(room) <= WS_MAX_ROOM_NAME):
+            self.send(connection, {"type": "error", "detail": "Invalid room"})
+        elif action == "join":
+            if self.join(connection, room):
+                self.send(connection, {"type": "joined", "room": room})
+            else:
+                self.send(connection, {"type": "error", "detail": "Too many rooms"})
+        elif action == "leave":
+            self.leave(connection, room)
+            self.send(connection, {"type": "left", "room": room})
+        elif action == "publish":
+            if room not in connection.rooms:
+                self.send(connection, {"type": "error", "detail": "Join the room before publishing"})
+            else:
+                self.broadcast(room, {"type": "message", "room": room, "data": message.get("data")})
+        else:
+            self.send(connection, {"type": "error", "detail": "Unknown action"})
+
+    async def serve(self, websocket: WebSocket):
+        connection = await self.connect(websocket)
+        try:
+            while True:
+                text = await websocket.receive_text()
+                connection.last_seen = time.monotonic()
+                await self.handle(connection, text)
+        except WebSocketDisconnect:
+            pass
+        except Exception:
+            if not connection.closed:
+                logger.exception("WebSocket connection %s failed", connection.id)
+        finally:
+            await self.disconnect(connection)
+
+    async def _heartbeat_loop(self):
+        ping = json.dumps({"type": "ping"})
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            deadline = time.monotonic() - self.idle_timeout
+            for connection in list(self.connections):
+                if connection.last_seen < deadline:
+                    self.idle_disconnects += 1
+                    self.spawn(self.disconnect(connection, CLOSE_POLICY_VIOLATION))
+                else:
+                    connection.enqueue(ping)
+
+    def start(self):
+        if self._heartbeat is None:
+            self._heartbeat = self.spawn(self._heartbeat_loop())
+
+    async def shutdown(self):
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+            self._heartbeat = None
+        await asyncio.gather(
+            *(self.disconnect(connection, CLOSE_GOING_AWAY) for connection in list(self.connections)),
+            return_exceptions=True
+        )
+        # Déconnexions encore en cours
+        await asyncio.gather(*list(self._tasks), return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "connections": len(self.connections),
+            "rooms": len(self.rooms),
+            "largest_room": max((len(members) for members in self.rooms.values()), default=0),
+            "messages_sent": self.messages_sent,
+            "messages_dropped": self.messages_dropped,
+            "slow_disconnects": self.slow_disconnects,
+            "idle_disconnects": self.idle_disconnects,
+            "queued": sum(connection.queue.qsize() for connection in self.connections),
+            "tasks": len(self._tasks),
+        }
+
+
+hub = ConnectionHub(WS_SEND_QUEUE_SIZE, WS_SLOW_CONSUMER_POLICY, WS_HEARTBEAT_INTERVAL, WS_IDLE_TIMEOUT)